@@ -0,0 +1,38 @@
+'''Measures how fast CookieJar builds Cookie header values.
+
+Usage: python bench/cookie_header.py [cookies] [headers]
+'''
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ocookie
+
+def make_jar(count):
+    cookie_jar = ocookie.CookieJar()
+    for i in range(count):
+        if i % 2:
+            attributes = {'expires': 'Wed, 11-Feb-2037 22:59:51 GMT'}
+        else:
+            attributes = {'max_age': 86400}
+        cookie_jar.add(ocookie.Cookie('cookie%d' % i, 'value%08x' % i, path='/' * (i % 3 + 1), **attributes))
+    return cookie_jar
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    number = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    cookie_jar = make_jar(count)
+    cases = [
+        ('build_cookie_header_value()', cookie_jar.build_cookie_header_value),
+        ('build_cookie_header_value(max_size=100)', lambda: cookie_jar.build_cookie_header_value(max_size=100)),
+        ('CookieDict.cookie_header_value()', cookie_jar.cookie_dict.cookie_header_value),
+    ]
+    for label, function in cases:
+        elapsed = min(timeit.repeat(function, number=number, repeat=3))
+        print('%-42s %10.0f headers/s' % (label, number / elapsed))
+
+if __name__ == '__main__':
+    main()
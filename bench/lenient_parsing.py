@@ -0,0 +1,63 @@
+'''Compares strict and lenient Set-Cookie parsing throughput on a corpus
+in which about 20% of values carry attributes ocookie does not know
+(SameSite, Priority, Partitioned).
+
+The strict parser raises CookieError on such values; its loop catches
+the exception, as a batch pipeline would.
+
+Usage: python bench/lenient_parsing.py [values]
+'''
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ocookie
+
+modern_attributes = ['SameSite=Lax', 'SameSite=None', 'Priority=High', 'Partitioned']
+
+def make_corpus(size, modern_share=0.2, seed=1):
+    rng = random.Random(seed)
+    corpus = []
+    for i in range(size):
+        text = 'cookie%d=%08x; path=/; domain=.example%d.com; expires=Wed, 11-Feb-2037 22:59:51 GMT; httponly' % (
+            i % 50, rng.getrandbits(32), i % 100)
+        if rng.random() < modern_share:
+            text += '; ' + rng.choice(modern_attributes)
+        corpus.append(text)
+    return corpus
+
+def run_strict(corpus):
+    parse = ocookie.CookieParser.parse_set_cookie_value
+    errors = 0
+    start = time.time()
+    for text in corpus:
+        try:
+            parse(text)
+        except ocookie.CookieError:
+            errors += 1
+    return time.time() - start, errors
+
+def run_lenient(corpus):
+    parse = ocookie.CookieParser.parse_set_cookie_value_lenient
+    flagged = 0
+    start = time.time()
+    for text in corpus:
+        cookie, warnings = parse(text)
+        if warnings:
+            flagged += 1
+    return time.time() - start, flagged
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    corpus = make_corpus(size)
+    elapsed, errors = run_strict(corpus)
+    print('%-10s %10.0f values/s  %d raised' % ('strict', size / elapsed, errors))
+    elapsed, flagged = run_lenient(corpus)
+    print('%-10s %10.0f values/s  %d with warnings' % ('lenient', size / elapsed, flagged))
+
+if __name__ == '__main__':
+    main()
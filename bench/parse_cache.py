@@ -0,0 +1,58 @@
+'''Compares CookieParser with SetCookieParseCache on Set-Cookie values
+whose frequencies follow a Zipf distribution.
+
+Usage: python bench/parse_cache.py [headers] [distinct values] [exponent]
+'''
+
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ocookie
+import ocookie.cache
+
+def make_values(count):
+    values = []
+    for i in range(count):
+        values.append('cookie%d=%08x; path=/; domain=.host%d.example.com; '
+            'expires=Wed, 11-Feb-2037 22:59:51 GMT; httponly' % (i % 50, i, i))
+    return values
+
+def zipf_corpus(values, size, exponent, seed=1):
+    rng = random.Random(seed)
+    weights = [1.0 / (rank ** exponent) for rank in range(1, len(values) + 1)]
+    total = sum(weights)
+    cumulative = []
+    running = 0.0
+    for weight in weights:
+        running += weight / total
+        cumulative.append(running)
+    import bisect
+    return [values[min(bisect.bisect_left(cumulative, rng.random()), len(values) - 1)] for i in range(size)]
+
+def run(parser, corpus):
+    parse = parser.parse_set_cookie_value
+    start = time.time()
+    for text in corpus:
+        parse(text)
+    return time.time() - start
+
+def main():
+    size = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    distinct = int(sys.argv[2]) if len(sys.argv) > 2 else 10000
+    exponent = float(sys.argv[3]) if len(sys.argv) > 3 else 1.1
+    corpus = zipf_corpus(make_values(distinct), size, exponent)
+    
+    elapsed = run(ocookie.CookieParser, corpus)
+    print('%-28s %10.0f headers/s' % ('CookieParser', size / elapsed))
+    for max_entries in (256, 1024, 4096):
+        cache = ocookie.cache.SetCookieParseCache(max_entries=max_entries)
+        elapsed = run(cache, corpus)
+        print('%-28s %10.0f headers/s  hit rate %.1f%%' % (
+            'cache, %d entries' % max_entries, size / elapsed, cache.hit_rate * 100))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+'''Measures public suffix lookups per second on a synthetic host name
+corpus, and list load time with and without the compiled cache.
+
+Usage: python bench/publicsuffix.py [public suffix list file] [hosts]
+
+Without a file argument the list shipped by the operating system is used
+if present, otherwise a synthetic list is generated.
+'''
+
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+from ocookie.publicsuffix import PublicSuffixList
+
+system_lists = ['/usr/share/publicsuffix/public_suffix_list.dat']
+
+def synthetic_list(rng):
+    lines = []
+    for i in range(1500):
+        tld = 'tld%d' % i
+        lines.append(tld)
+        for j in range(rng.randint(0, 8)):
+            lines.append('sld%d.%s' % (j, tld))
+        if i % 50 == 0:
+            lines.append('*.wild.%s' % tld)
+            lines.append('!www.wild.%s' % tld)
+    return '\n'.join(lines) + '\n'
+
+def synthetic_hosts(psl_text, count, rng):
+    suffixes = [line.lstrip('!').replace('*', 'any') for line in psl_text.splitlines()
+        if line and not line.startswith('//')]
+    hosts = []
+    for i in range(count):
+        labels = ['h%d' % rng.randint(0, 999) for depth in range(rng.randint(0, 3))]
+        hosts.append('.'.join(labels + [rng.choice(suffixes)]))
+    return hosts
+
+def main():
+    rng = random.Random(1)
+    directory = tempfile.mkdtemp()
+    try:
+        if len(sys.argv) > 1:
+            path = sys.argv[1]
+        else:
+            path = [candidate for candidate in system_lists if os.path.exists(candidate)]
+            if path:
+                path = path[0]
+            else:
+                path = os.path.join(directory, 'synthetic.dat')
+                with open(path, 'w') as f:
+                    f.write(synthetic_list(rng))
+        count = int(sys.argv[2]) if len(sys.argv) > 2 else 200000
+        cache_path = os.path.join(directory, 'list.cache')
+        
+        start = time.time()
+        psl = PublicSuffixList.load(path, cache_path=cache_path)
+        print('%-24s %8.2f ms' % ('load and compile', (time.time() - start) * 1000))
+        start = time.time()
+        psl = PublicSuffixList.load(path, cache_path=cache_path)
+        print('%-24s %8.2f ms' % ('load from cache', (time.time() - start) * 1000))
+        
+        with open(path, 'rb') as f:
+            text = f.read().decode('utf8')
+        hosts = synthetic_hosts(text, count, rng)
+        is_public_suffix = psl.is_public_suffix
+        start = time.time()
+        for host in hosts:
+            is_public_suffix(host)
+        elapsed = time.time() - start
+        print('%-24s %8.0f lookups/s' % ('is_public_suffix', count / elapsed))
+    finally:
+        shutil.rmtree(directory)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+'''Compares per-worker CookieJar instances with one SharedCookieJar
+across several worker processes.
+
+Each worker builds Cookie header values from a jar holding the same
+cookies and, every 100 headers, stores one updated cookie.
+
+Usage: python bench/shared_jar.py [workers] [headers per worker] [cookies]
+'''
+
+import multiprocessing
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ocookie
+import ocookie.shared
+
+def fill(cookie_jar, count):
+    for i in range(count):
+        cookie_jar.add(ocookie.Cookie('cookie%d' % i, 'value%08x' % i, path='/', max_age=86400))
+
+def worker(cookie_jar, count, results):
+    start = time.time()
+    for i in range(count):
+        cookie_jar.build_cookie_header_value()
+        if i % 100 == 0:
+            cookie_jar.add(ocookie.Cookie('cookie0', 'value%08x' % i, path='/', max_age=86400))
+    results.put(time.time() - start)
+
+def run(make_jar, workers, count):
+    results = multiprocessing.Queue()
+    processes = [multiprocessing.Process(target=worker, args=(make_jar(), count, results)) for i in range(workers)]
+    start = time.time()
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.time() - start
+    return workers * count / elapsed
+
+def main():
+    workers = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 20000
+    cookies = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    
+    def make_private_jar():
+        cookie_jar = ocookie.CookieJar()
+        fill(cookie_jar, cookies)
+        return cookie_jar
+    
+    shared_jar = ocookie.shared.SharedCookieJar(capacity=max(64, cookies * 2))
+    fill(shared_jar, cookies)
+    try:
+        print('%-22s %10.0f headers/s' % ('per-worker CookieJar', run(make_private_jar, workers, count)))
+        print('%-22s %10.0f headers/s' % ('SharedCookieJar', run(lambda: shared_jar, workers, count)))
+    finally:
+        shared_jar.close()
+        shared_jar.unlink()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,54 @@
+'''Measures per-request overhead of ocookie.wsgi.CookieMiddleware.
+
+Runs a trivial application through wsgiref's test environ with a large
+Cookie header, comparing the bare application, the middleware with an
+application that never reads cookies and the middleware with an
+application that does.
+
+Usage: python bench/wsgi_middleware.py [requests]
+'''
+
+import os
+import sys
+import timeit
+import wsgiref.util
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+
+import ocookie.wsgi
+
+cookie_header = '; '.join('cookie%d=value%d' % (i, i) for i in range(30))
+
+def ignoring_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+def reading_app(environ, start_response):
+    ocookie.wsgi.request_cookies(environ).get('cookie0')
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'ok']
+
+def start_response(status, headers, exc_info=None):
+    pass
+
+def make_runner(app):
+    base_environ = {'HTTP_COOKIE': cookie_header}
+    wsgiref.util.setup_testing_defaults(base_environ)
+    
+    def run():
+        app(dict(base_environ), start_response)
+    return run
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    cases = [
+        ('bare application', ignoring_app),
+        ('middleware, cookies not read', ocookie.wsgi.CookieMiddleware(ignoring_app)),
+        ('middleware, cookies read', ocookie.wsgi.CookieMiddleware(reading_app)),
+    ]
+    for label, app in cases:
+        elapsed = min(timeit.repeat(make_runner(app), number=count, repeat=3))
+        print('%-30s %8.2f us/request' % (label, elapsed / count * 1e6))
+
+if __name__ == '__main__':
+    main()
@@ -1,19 +1,11 @@
+import sys
 import time
 
 # python 2/3 compatibility
-try:
-    # 3.x and this must be first
-    import urllib.parse as urllib_parse
-except ImportError:
-    # 2.x
-    import urllib as urllib_parse
-
-try:
-    # 2.x
-    base_exception_class = StandardError
-except NameError:
-    # 3.x
+if sys.version_info[0] >= 3:
     base_exception_class = Exception
+else:
+    base_exception_class = StandardError
 
 class CookieError(base_exception_class):
     pass
@@ -26,13 +18,39 @@ ALL_ATTRIBUTES = [
     'name', 'value'
 ] + OPTIONAL_ATTRIBUTES
 
-OPTIONAL_ATTRIBUTES_DICT = {}
-for key in OPTIONAL_ATTRIBUTES:
-    OPTIONAL_ATTRIBUTES_DICT[key] = True
-ALL_ATTRIBUTES_DICT = {}
-for key in ALL_ATTRIBUTES:
-    ALL_ATTRIBUTES_DICT[key] = True
-del key
+OPTIONAL_ATTRIBUTES_DICT = dict.fromkeys(OPTIONAL_ATTRIBUTES, True)
+ALL_ATTRIBUTES_DICT = dict.fromkeys(ALL_ATTRIBUTES, True)
+
+# Codes reported by CookieParser.parse_set_cookie_value_lenient
+PARSE_MISSING_NAME = 'missing-name'
+PARSE_INVALID_ATTRIBUTE = 'invalid-attribute'
+PARSE_UNKNOWN_ATTRIBUTE = 'unknown-attribute'
+
+# How attribute names are spelled in Set-Cookie headers we generate
+ATTRIBUTE_SPELLINGS = {
+    'comment': 'Comment', 'domain': 'Domain', 'expires': 'Expires',
+    'httponly': 'HttpOnly', 'max-age': 'Max-Age', 'path': 'Path',
+    'secure': 'Secure', 'version': 'Version',
+}
+
+# The active ocookie.tracing.Tracer, or None when tracing is disabled;
+# set by ocookie.tracing.enable and disable
+tracer = None
+
+# Submodules that are imported on first attribute access,
+# e.g. ocookie.httplib_adapter
+LAZY_SUBMODULES = frozenset([
+    'cache', 'cherrypywebtest', 'columns', 'httplib_adapter',
+    'publicsuffix', 'shared', 'stream', 'tracing', 'wsgi',
+])
+
+def __getattr__(name):
+    # Python 3.7+ calls this for attributes missing from the module;
+    # on older versions submodules must be imported explicitly.
+    if name in LAZY_SUBMODULES:
+        __import__(__name__ + '.' + name)
+        return sys.modules[__name__ + '.' + name]
+    raise AttributeError("module %r has no attribute %r" % (__name__, name))
 
 class RawCookie(object):
     '''An unaltered cookie from a Set-Cookie header.
@@ -42,6 +60,20 @@ class RawCookie(object):
     the value of expires would be None.
     '''
     
+    # Set on cookies that share their attributes dictionary with other
+    # cookies (see _share); such cookies copy the dictionary before
+    # their first attribute assignment.
+    _attributes_shared = False
+    
+    # Attributes not defined by the cookie RFCs (e.g. SameSite), as kept by
+    # CookieParser.parse_set_cookie_value_lenient: a dictionary mapping
+    # lowercased attribute names to values, or None if there are none.
+    extensions = None
+    
+    # "name=value" text for Cookie headers, rendered on first use and
+    # discarded when name or value change; see cookie_header_fragment
+    _header_fragment = None
+    
     def __init__(self, name, value, **attributes):
         # Apparently cherrypy changes max-age to Max-Age at some point.
         # And this is how it is spelled in RFC too.
@@ -69,14 +101,52 @@ class RawCookie(object):
         return self.attributes.get(key, None)
     
     def __setattr__(self, key, value):
-        if key in ('attributes', 'name', 'value'):
+        if key in ('attributes', 'name', 'value', 'extensions'):
             object.__setattr__(self, key, value)
+            if key == 'attributes':
+                object.__setattr__(self, '_attributes_shared', False)
+            elif key != 'extensions' and self._header_fragment is not None:
+                object.__setattr__(self, '_header_fragment', None)
         else:
             key_lower = key.lower()
             if not key_lower in OPTIONAL_ATTRIBUTES_DICT:
                 raise AttributeError("Unrecognized cookie attribute: " + str(key))
+            if self._attributes_shared:
+                self.attributes = dict(self.attributes)
             self.attributes[key_lower] = value
     
+    @property
+    def cookie_header_fragment(self):
+        '''The "name=value" text representing this cookie in a Cookie header.
+        
+        Empty for cookies with empty values, which are not sent.
+        '''
+        
+        fragment = self._header_fragment
+        if fragment is None:
+            # do not send empty cookies
+            if self.value is None or self.value.strip() == '':
+                fragment = ''
+            else:
+                # XXX try not quoting cookie value
+                # was: urllib quote(cookie.value)
+                fragment = self.name + '=' + self.value
+            object.__setattr__(self, '_header_fragment', fragment)
+        return fragment
+    
+    def _share(self):
+        '''Returns a copy of this cookie sharing its attributes dictionary.
+        
+        Both cookies copy the dictionary before changing an attribute,
+        so the copy is cheap to make and safe to hand out repeatedly.
+        '''
+        
+        copy = object.__new__(self.__class__)
+        copy.__dict__.update(self.__dict__)
+        object.__setattr__(copy, '_attributes_shared', True)
+        object.__setattr__(self, '_attributes_shared', True)
+        return copy
+    
     def __str__(self):
         attrs = ''
         for key in self.attributes:
@@ -86,6 +156,69 @@ class RawCookie(object):
     @property
     def expires_timestamp(self):
         return CookieExpirationTime.parse(self.expires).value
+    
+    def set_cookie_header_value(self):
+        '''Creates value for a Set-Cookie header, as would be sent by
+        a server, from this cookie.
+        
+        Attributes set to True are rendered as flags (e.g. HttpOnly);
+        attributes set to None or False are omitted. Extension attributes
+        follow the standard ones. A value of None is rendered as empty.
+        '''
+        
+        value = self.value
+        if value is None:
+            value = ''
+        text = self.name + '=' + value + format_set_cookie_attributes(self.attributes)
+        if self.extensions:
+            text += format_set_cookie_extensions(self.extensions)
+        return text
+    
+    @classmethod
+    def _from_canonical(cls, name, value, attributes, extensions=None):
+        '''Creates a cookie from an attributes dictionary that is already
+        in canonical form (lowercase known attribute names, float max-age),
+        skipping the conversions performed by __init__.
+        '''
+        
+        cookie = object.__new__(cls)
+        cookie.__dict__.update(name=name, value=value, attributes=attributes)
+        if extensions is not None:
+            cookie.__dict__['extensions'] = extensions
+        return cookie
+
+def format_set_cookie_attributes(attributes):
+    '''Formats a dictionary of cookie attributes as they appear in
+    a Set-Cookie header after the cookie value, e.g. "; Path=/; HttpOnly".
+    '''
+    
+    parts = []
+    for key in attributes:
+        value = attributes[key]
+        if value is None or value is False:
+            continue
+        name = ATTRIBUTE_SPELLINGS[key]
+        if value is True:
+            parts.append('; ' + name)
+        else:
+            if key == 'max-age' and value == int(value):
+                value = int(value)
+            parts.append('; %s=%s' % (name, value))
+    return ''.join(parts)
+
+def format_set_cookie_extensions(extensions):
+    '''Formats a dictionary of extension attributes (see
+    RawCookie.extensions) like format_set_cookie_attributes.
+    '''
+    
+    parts = []
+    for key in extensions:
+        value = extensions[key]
+        if value is True:
+            parts.append('; ' + key)
+        else:
+            parts.append('; %s=%s' % (key, value))
+    return ''.join(parts)
 
 class Cookie(RawCookie):
     '''A canonicalized cookie.
@@ -107,20 +240,107 @@ strftime_format2 = '%a, %d %b %Y %H:%M:%S %Z'
 strftime_format_netscape = '%a, %d-%b-%Y %H:%M:%S %Z'
 strftime_format_netscape_short_year = '%a, %d-%b-%y %H:%M:%S %Z'
 
+def _timegm(time_tuple):
+    # calendar is only needed once dates are parsed; import it on first
+    # use and replace this function with calendar.timegm
+    global _timegm
+    import calendar
+    _timegm = calendar.timegm
+    return _timegm(time_tuple)
+
+WEEKDAY_NAMES = frozenset(['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun'])
+MONTH_NUMBERS = {
+    'Jan': 1, 'Feb': 2, 'Mar': 3, 'Apr': 4, 'May': 5, 'Jun': 6,
+    'Jul': 7, 'Aug': 8, 'Sep': 9, 'Oct': 10, 'Nov': 11, 'Dec': 12,
+}
+MONTH_DAYS = (31, 28, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31)
+
+def _parse_http_time_fast(time_str):
+    '''Parses dates in the fixed width GMT forms of strftime_format2,
+    strftime_format_netscape and strftime_format_netscape_short_year
+    without time.strptime, which is several times slower.
+    
+    Returns None for any other text, including text that strptime might
+    accept, so that the caller can fall back to strptime.
+    '''
+    
+    length = len(time_str)
+    separator = time_str[7:8]
+    if length == 29:
+        year = time_str[12:16]
+    elif length == 27 and separator == '-':
+        year = time_str[12:14]
+    else:
+        return None
+    if (time_str[:3] not in WEEKDAY_NAMES or time_str[3:5] != ', '
+        or separator not in (' ', '-') or time_str[11] != separator
+        or time_str[-13] != ' ' or time_str[-10] != ':' or time_str[-7] != ':'
+        or time_str[-4:] != ' GMT'
+    ):
+        return None
+    month = MONTH_NUMBERS.get(time_str[8:11])
+    fields = (year, time_str[5:7], time_str[-12:-10], time_str[-9:-7], time_str[-6:-4])
+    if month is None or not all([field.isdigit() for field in fields]):
+        return None
+    year, day, hour, minute, second = [int(field) for field in fields]
+    if length == 27:
+        # as strptime interprets %y
+        if year <= 68:
+            year += 2000
+        else:
+            year += 1900
+    days = MONTH_DAYS[month - 1]
+    if month == 2 and year % 4 == 0 and (year % 100 != 0 or year % 400 == 0):
+        days = 29
+    if not 1 <= day <= days or hour > 23 or minute > 59 or second > 61:
+        return None
+    return _timegm((year, month, day, hour, minute, second, 0, 0, 0))
+
 def parse_http_time(time_str):
     if time_str:
-        import calendar
-        try:
-            value = calendar.timegm(time.strptime(time_str, strftime_format2))
-        except ValueError:
+        active_tracer = tracer
+        if active_tracer is not None:
+            start = active_tracer.clock()
+        value = _parse_http_time_fast(time_str)
+        if value is None:
+            # all accepted layouts have a comma after the weekday;
+            # rejecting other text here spares three failing strptime calls
+            if ',' not in time_str:
+                raise ValueError('Unsupported date format: %s' % time_str)
             try:
-                value = calendar.timegm(time.strptime(time_str, strftime_format_netscape))
+                value = _timegm(time.strptime(time_str, strftime_format2))
             except ValueError:
-                value = calendar.timegm(time.strptime(time_str, strftime_format_netscape_short_year))
+                try:
+                    value = _timegm(time.strptime(time_str, strftime_format_netscape))
+                except ValueError:
+                    value = _timegm(time.strptime(time_str, strftime_format_netscape_short_year))
+        if active_tracer is not None:
+            active_tracer.record('date', start)
     else:
         value = None
     return value
 
+# Results of expires validation in lenient parsing, keyed by the raw
+# text. Servers send the same few expiry strings over and over, so a
+# small cache avoids most date parsing; it is emptied when full.
+VALID_EXPIRES_CACHE_SIZE = 256
+_valid_expires_cache = {}
+
+def _valid_expires(time_str):
+    try:
+        return _valid_expires_cache[time_str]
+    except KeyError:
+        pass
+    try:
+        parse_http_time(time_str)
+        valid = True
+    except ValueError:
+        valid = False
+    if len(_valid_expires_cache) >= VALID_EXPIRES_CACHE_SIZE:
+        _valid_expires_cache.clear()
+    _valid_expires_cache[time_str] = valid
+    return valid
+
 class CookieExpirationTime(object):
     def __init__(self, value, str=None):
         if not isinstance(value, int) and not isinstance(value, float):
@@ -148,16 +368,25 @@ class LiveCookie(RawCookie):
         self.issue_time = time.time()
         RawCookie.__init__(self, name, value, **attributes)
     
-    def valid(self):
+    def valid(self, now=None):
         expires = self.expires_timestamp
         if expires is None:
             # valid until the end of session
             # assume as long as we're alive, we are in the session
             return True
-        return expires > time.time()
+        if now is None:
+            now = time.time()
+        return expires > now
     
     @property
     def expires_timestamp(self):
+        # parsing expires is expensive and valid() is called every time
+        # a Cookie header is built, therefore remember the result until
+        # an attribute or issue_time changes
+        try:
+            return self.__dict__['_expires_timestamp']
+        except KeyError:
+            pass
         max_age = self.attributes.get('max-age')
         if max_age is not None:
             expires = self.issue_time + max_age
@@ -165,9 +394,11 @@ class LiveCookie(RawCookie):
             expires = self.attributes.get('expires')
             if expires is not None:
                 expires = CookieExpirationTime.parse(expires).value
+        self.__dict__['_expires_timestamp'] = expires
         return expires
     
     def __setattr__(self, key, value):
+        self.__dict__.pop('_expires_timestamp', None)
         if key == 'issue_time':
             object.__setattr__(self, key, value)
         else:
@@ -180,20 +411,26 @@ class CookieParser(object):
         pairs = text.split(';')
         for pair in pairs:
             pair = pair.strip()
-            name, value = pair.split('=')
+            name, separator, value = pair.partition('=')
+            if not separator:
+                # empty pair, or a bare token which names no cookie
+                continue
             cookie = Cookie(name, value)
             cookie_dict[name] = cookie
         return cookie_dict
     
     @staticmethod
     def parse_set_cookie_value(text):
+        active_tracer = tracer
+        if active_tracer is not None:
+            start = active_tracer.clock()
         attrs = text.split(';')
         name, value = attrs[0].split('=', 1)
         kwargs = {}
         for attr in attrs[1:]:
             if attr.strip() == '':
                 continue
-            fields = attr.split('=')
+            fields = attr.split('=', 1)
             if len(fields) > 1:
                 attr_name, attr_value = [field.strip() for field in fields]
             else:
@@ -203,7 +440,73 @@ class CookieParser(object):
             if not attr_name in OPTIONAL_ATTRIBUTES_DICT:
                 raise CookieError("Invalid cookie attribute: %s in cookie: %s" % (attr_name, text))
             kwargs[attr_name.replace('-', '_')] = attr_value
-        return Cookie(name, value, **kwargs)
+        if active_tracer is None:
+            return Cookie(name, value, **kwargs)
+        start = active_tracer.record('tokenize', start)
+        cookie = Cookie(name, value, **kwargs)
+        active_tracer.record('construct', start)
+        return cookie
+    
+    @staticmethod
+    def parse_set_cookie_value_lenient(text):
+        '''Parses a Set-Cookie value without raising exceptions.
+        
+        Returns a (cookie, warnings) tuple. warnings is a list of
+        (code, detail) tuples, code being one of the PARSE_* constants.
+        Attributes not known to ocookie are stored in cookie.extensions
+        and reported with PARSE_UNKNOWN_ATTRIBUTE. Malformed attributes,
+        including max-age values that are not numbers and expires values
+        that parse_http_time does not accept, are dropped and reported
+        with PARSE_INVALID_ATTRIBUTE. If no cookie can be parsed at all, cookie is None
+        and warnings describes the reason.
+        '''
+        
+        active_tracer = tracer
+        if active_tracer is not None:
+            start = active_tracer.clock()
+        warnings = []
+        attrs = text.split(';')
+        name, separator, value = attrs[0].partition('=')
+        if not separator or not name.strip():
+            warnings.append((PARSE_MISSING_NAME, text))
+            return None, warnings
+        attributes = {}
+        extensions = None
+        for attr in attrs[1:]:
+            attr_name, separator, attr_value = attr.partition('=')
+            attr_name = attr_name.strip().lower()
+            if not attr_name:
+                if separator or attr_value.strip():
+                    warnings.append((PARSE_INVALID_ATTRIBUTE, attr))
+                continue
+            if separator:
+                attr_value = attr_value.strip()
+            else:
+                attr_value = True
+            if attr_name in OPTIONAL_ATTRIBUTES_DICT:
+                if attr_name == 'max-age' or attr_name == 'expires':
+                    try:
+                        if not separator:
+                            raise ValueError('%s requires a value' % attr_name)
+                        if attr_name == 'max-age':
+                            attr_value = float(attr_value)
+                        elif not _valid_expires(attr_value):
+                            raise ValueError('Invalid expires: %s' % attr_value)
+                    except ValueError:
+                        warnings.append((PARSE_INVALID_ATTRIBUTE, attr))
+                        continue
+                attributes[attr_name] = attr_value
+            else:
+                if extensions is None:
+                    extensions = {}
+                extensions[attr_name] = attr_value
+                warnings.append((PARSE_UNKNOWN_ATTRIBUTE, attr_name))
+        if active_tracer is None:
+            return Cookie._from_canonical(name, value, attributes, extensions), warnings
+        start = active_tracer.record('tokenize', start)
+        cookie = Cookie._from_canonical(name, value, attributes, extensions)
+        active_tracer.record('construct', start)
+        return cookie, warnings
     
     @staticmethod
     def parse_set_cookie_header(text):
@@ -229,8 +532,8 @@ class CookieDict(dict):
     '''
     
     def cookie_header_value(self):
-        pairs = [name + '=' + self[name].value for name in self if self[name].value is not None and self[name].value.strip() != '']
-        return '; '.join(pairs)
+        fragments = [cookie.cookie_header_fragment for cookie in self.values()]
+        return '; '.join([fragment for fragment in fragments if fragment])
 
 class CookieJar(object):
     '''A cookie jar, as is commonly implemented by user agents.
@@ -238,14 +541,22 @@ class CookieJar(object):
     Understands cookie expiration. Setting a cookie with an invalid or
     past expiration time deletes the cookie from the jar. Cookies that
     expire naturally are also automatically removed from the jar.
+    
+    If a public_suffix_list (an ocookie.publicsuffix.PublicSuffixList)
+    is given, cookies whose domain is a public suffix are rejected.
     '''
     
-    def __init__(self, cookie_jar=None):
+    public_suffix_list = None
+    
+    def __init__(self, cookie_jar=None, public_suffix_list=None):
         if cookie_jar is None:
             self.cookie_dict = CookieDict()
         else:
             # copy
             self.cookie_dict = CookieDict(cookie_jar.cookie_dict)
+            if public_suffix_list is None:
+                public_suffix_list = cookie_jar.public_suffix_list
+        self.public_suffix_list = public_suffix_list
     
     def __iter__(self):
         return self.cookie_dict.__iter__()
@@ -262,7 +573,7 @@ class CookieJar(object):
     def __contains__(self, name):
         return name in self.cookie_dict
     
-    def add(self, cookie):
+    def add(self, cookie, request_host=None):
         '''Adds a cookie to the cookie jar.
         
         If a cookie already exists with the same name, the old cookie is
@@ -271,45 +582,135 @@ class CookieJar(object):
         If the expiration time of the new cookie is in the past then
         no cookie is set (and if there was an existing cookie with the
         same name, the old cookie is deleted).
+        
+        If the jar has a public suffix list and the cookie's domain is
+        a public suffix, the cookie is ignored, unless request_host (the
+        host the cookie was received from) equals the domain, in which case
+        the domain attribute is dropped and the cookie is stored as
+        a host-only cookie (RFC 6265 section 5.3, step 5).
         '''
         
+        active_tracer = tracer
+        if active_tracer is not None:
+            start = active_tracer.clock()
+        
         if not isinstance(cookie, LiveCookie):
+            extensions = cookie.extensions
             cookie = LiveCookie(cookie.name, cookie.value, **cookie.attributes)
+            if extensions is not None:
+                cookie.extensions = extensions
+            if active_tracer is not None:
+                start = active_tracer.record('construct', start)
+        
+        if self.public_suffix_list is not None:
+            cookie = self._check_domain(cookie, request_host)
         
+        if cookie is None:
+            # rejected by _check_domain
+            pass
         # valid means not expired
-        if cookie.valid():
+        elif cookie.valid():
+            # render the Cookie header fragment now rather than
+            # when building headers
+            cookie.cookie_header_fragment
             self.cookie_dict[cookie.name] = cookie
         # if cookie was never set, and we are asked to set it with
         # an expiration date in the past, do nothing
         elif cookie.name in self.cookie_dict:
             del self.cookie_dict[cookie.name]
+        
+        if active_tracer is not None:
+            active_tracer.record('insert', start)
+    
+    def _check_domain(self, cookie, request_host):
+        '''Returns cookie, a copy of cookie restricted to request_host,
+        or None if cookie must be rejected because its domain is a public
+        suffix. cookie itself is not changed.
+        '''
+        
+        domain = cookie.attributes.get('domain')
+        if not domain or not self.public_suffix_list.is_public_suffix(domain):
+            return cookie
+        if request_host is not None and request_host.lower().strip('.') == domain.lower().strip('.'):
+            attributes = dict(cookie.attributes)
+            del attributes['domain']
+            copy = object.__new__(cookie.__class__)
+            copy.__dict__.update(cookie.__dict__)
+            copy.attributes = attributes
+            return copy
+        return None
     
     def valid_cookies(self):
         # XXX hack relying on current internals of CookieDict
-        return [cookie for cookie in self.cookie_dict.values() if cookie.valid()]
+        now = time.time()
+        return [cookie for cookie in self.cookie_dict.values() if cookie.valid(now)]
     
-    def build_cookie_header_value(self):
+    def build_cookie_header_value(self, max_size=None):
         '''Creates value for a Cookie header, as would be sent by a user agent,
         from cookies currently in the jar.
         
         Cookies that are expired are not included.
+        
+        If max_size is given, the value is limited to max_size bytes,
+        counted in UTF-8, by leaving out the lowest priority cookies. Following RFC 6265
+        section 5.4, cookies with longer paths have priority over cookies
+        with shorter paths, and among cookies with equal path lengths
+        older cookies have priority over newer ones. The cookies that are
+        sent are then listed in priority order.
         '''
         
-        cookies = []
-        for cookie in self.valid_cookies():
-            # do not send empty cookies
-            if cookie.value is not None and cookie.value.strip() != '':
-                # XXX try not quoting cookie value
-                # was: urllib_parse.quote(cookie.value)
-                text = cookie.name + '=' + cookie.value
-                cookies.append(text)
-        return '; '.join(cookies)
+        cookies = self.valid_cookies()
+        if max_size is None:
+            fragments = [cookie.cookie_header_fragment for cookie in cookies]
+            return '; '.join([fragment for fragment in fragments if fragment])
+        
+        cookies.sort(key=cookie_priority_key)
+        fragments = []
+        size = -2
+        for cookie in cookies:
+            fragment = cookie.cookie_header_fragment
+            if fragment:
+                # 2 for the '; ' separator
+                size += encoded_size(fragment) + 2
+                if size > max_size:
+                    break
+                fragments.append(fragment)
+        return '; '.join(fragments)
     
     def clear(self):
         self.cookie_dict = CookieDict()
     
     def keys(self):
         return self.cookie_dict.keys()
+    
+    def to_columns(self, use_numpy=None):
+        '''Exports cookies in the jar, including expired ones, into
+        a CookieColumns object for bulk analysis.
+        
+        See ocookie.columns for details.
+        '''
+        
+        from .columns import CookieColumns
+        return CookieColumns.from_cookies(self.cookie_dict.values(), use_numpy=use_numpy)
+
+def cookie_priority_key(cookie):
+    '''Sort key ordering cookies from highest to lowest priority
+    for inclusion in a Cookie header.
+    '''
+    
+    path = cookie.attributes.get('path') or ''
+    return (-len(path), cookie.issue_time)
+
+def encoded_size(text):
+    '''Returns the size of text in bytes when encoded as UTF-8.
+    
+    UTF-8 is never shorter than the latin-1 encoding http.client uses
+    for header values, so sizes are an upper bound for either.
+    '''
+    
+    if isinstance(text, bytes):
+        return len(text)
+    return len(text.encode('utf8'))
 
 def cookie_list_to_dict(cookie_list):
     cookie_dict = CookieDict()
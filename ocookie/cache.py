@@ -0,0 +1,111 @@
+'''Caching of parsed Set-Cookie values.
+
+Many Set-Cookie headers seen by a client are byte-for-byte identical
+(load balancer affinity cookies, consent cookies, tracking cookies with
+fixed expiration dates). SetCookieParseCache remembers the result of
+parsing each distinct header value so that repeated values are not
+parsed again.
+
+A SetCookieParseCache may be used anywhere CookieParser is accepted
+as a parser, e.g.:
+
+    cache = SetCookieParseCache(max_entries=4096)
+    cookies = httplib_adapter.parse_response_cookies(response, parser=cache)
+'''
+
+import threading
+
+try:
+    from collections import OrderedDict
+except ImportError:
+    # 2.6
+    OrderedDict = None
+
+from . import CookieParser, encoded_size
+
+class SetCookieParseCache(object):
+    '''A bounded least recently used cache of parsed Set-Cookie values.
+    
+    The cache holds at most max_entries parsed values and at most
+    max_bytes bytes of raw header values, counted in UTF-8; least
+    recently used entries are evicted first. Values longer than max_bytes are parsed
+    but not cached.
+    
+    Cookies returned by the cache share their attributes dictionary
+    with the cached entry. Assigning an attribute on a returned cookie
+    (e.g. cookie.path = '/') gives that cookie a private copy first,
+    leaving the cache and other returned cookies untouched. Mutating
+    cookie.attributes directly bypasses this and must be avoided.
+    '''
+    
+    def __init__(self, max_entries=1024, max_bytes=1024 * 1024, parser=CookieParser):
+        if OrderedDict is None:
+            raise RuntimeError('SetCookieParseCache requires collections.OrderedDict')
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.parser = parser
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.size_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def parse_set_cookie_value(self, text):
+        '''Returns a Cookie for text, parsing text only if it is not cached.
+        
+        Parse errors are not cached.
+        '''
+        
+        with self._lock:
+            cookie = self._entries.pop(text, None)
+            if cookie is not None:
+                # reinsert to mark as most recently used
+                self._entries[text] = cookie
+                self.hits += 1
+                return cookie._share()
+            self.misses += 1
+        
+        cookie = self.parser.parse_set_cookie_value(text)
+        size = encoded_size(text)
+        if size > self.max_bytes:
+            return cookie
+        
+        with self._lock:
+            if text not in self._entries:
+                self._entries[text] = cookie
+                self.size_bytes += size
+                while len(self._entries) > self.max_entries or self.size_bytes > self.max_bytes:
+                    evicted_text, evicted_cookie = self._entries.popitem(last=False)
+                    self.size_bytes -= encoded_size(evicted_text)
+                    self.evictions += 1
+        return cookie._share()
+    
+    def __len__(self):
+        return len(self._entries)
+    
+    def clear(self):
+        '''Removes all entries. Statistics are kept.'''
+        
+        with self._lock:
+            self._entries.clear()
+            self.size_bytes = 0
+    
+    @property
+    def hit_rate(self):
+        lookups = self.hits + self.misses
+        if lookups == 0:
+            return 0.0
+        return float(self.hits) / lookups
+    
+    def stats(self):
+        '''Returns a dictionary of cache statistics.'''
+        
+        return {
+            'entries': len(self._entries),
+            'bytes': self.size_bytes,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+            'hit_rate': self.hit_rate,
+        }
@@ -1,14 +1,24 @@
+import ocookie
 from . import CookieParser, CookieJar
 
-def parse_cookies(cpwt_cookies):
+def parse_cookies(cpwt_cookies, parser=CookieParser):
     '''Parses self.cookies after a getPage call.
+    
+    parser is an object with a parse_set_cookie_value method, such as
+    CookieParser or ocookie.cache.SetCookieParseCache.
     '''
     
-    cookies = [CookieParser.parse_set_cookie_value(cookie_header[1]) for cookie_header in cpwt_cookies]
+    tracer = ocookie.tracer
+    if tracer is not None:
+        start = tracer.clock()
+    values = [cookie_header[1] for cookie_header in cpwt_cookies]
+    if tracer is not None:
+        tracer.record('extract', start)
+    cookies = [parser.parse_set_cookie_value(value) for value in values]
     return cookies
 
 class CpwtCookieJar(CookieJar):
-    def update(self, cpwt_cookies):
-        cookies = parse_cookies(cpwt_cookies)
+    def update(self, cpwt_cookies, parser=CookieParser):
+        cookies = parse_cookies(cpwt_cookies, parser)
         for cookie in cookies:
             self.add(cookie)
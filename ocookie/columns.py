@@ -0,0 +1,219 @@
+'''Columnar export of cookie jars for bulk analysis.
+
+A CookieColumns object holds one entry per cookie in parallel columns:
+expiration timestamps, issue times, secure/httponly flags and integer
+domain codes indexing into a table of distinct domains. When NumPy is
+available the columns are NumPy arrays and the helpers below operate on
+whole columns at once; otherwise the columns are plain lists and the
+helpers fall back to equivalent pure Python loops.
+
+Session cookies (cookies without an expiration time) have an expiration
+timestamp of NaN. Cookies without a domain have a domain code of -1.
+'''
+
+import time
+
+from . import parse_http_time
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+NAN = float('nan')
+
+class CookieColumns(object):
+    '''Parallel columns describing a collection of cookies.
+    
+    Build instances with from_cookies or CookieJar.to_columns.
+    '''
+    
+    def __init__(self, names, expires, issue_times, secure, httponly,
+        domain_codes, domains, use_numpy
+    ):
+        self.names = names
+        self.expires = expires
+        self.issue_times = issue_times
+        self.secure = secure
+        self.httponly = httponly
+        self.domain_codes = domain_codes
+        self.domains = domains
+        self.use_numpy = use_numpy
+    
+    @classmethod
+    def from_cookies(cls, cookies, use_numpy=None):
+        '''Exports cookies into columns.
+        
+        Each distinct expires string is parsed once, no matter how many
+        cookies share it. Cookies without an issue_time (i.e. cookies
+        that are not LiveCookie instances) get the export time as their
+        issue time.
+        
+        use_numpy selects the column representation: True requires NumPy,
+        False forces plain lists and None uses NumPy if it is installed.
+        '''
+        
+        if use_numpy is None:
+            use_numpy = numpy is not None
+        elif use_numpy and numpy is None:
+            raise ImportError('NumPy is not available')
+        
+        now = time.time()
+        parsed_expires = {}
+        domain_index = {}
+        domains = []
+        names = []
+        expires = []
+        issue_times = []
+        secure = []
+        httponly = []
+        domain_codes = []
+        for cookie in cookies:
+            attributes = cookie.attributes
+            issue_time = getattr(cookie, 'issue_time', now)
+            max_age = attributes.get('max-age')
+            if max_age is not None:
+                expires_value = issue_time + max_age
+            else:
+                expires_str = attributes.get('expires')
+                if expires_str is None:
+                    expires_value = NAN
+                else:
+                    try:
+                        expires_value = parsed_expires[expires_str]
+                    except KeyError:
+                        expires_value = parsed_expires[expires_str] = parse_http_time(expires_str)
+            domain = attributes.get('domain')
+            if domain is None:
+                code = -1
+            else:
+                code = domain_index.get(domain)
+                if code is None:
+                    code = domain_index[domain] = len(domains)
+                    domains.append(domain)
+            names.append(cookie.name)
+            expires.append(expires_value)
+            issue_times.append(issue_time)
+            secure.append(bool(attributes.get('secure')))
+            httponly.append(bool(attributes.get('httponly')))
+            domain_codes.append(code)
+        
+        if use_numpy:
+            expires = numpy.array(expires, dtype=numpy.float64)
+            issue_times = numpy.array(issue_times, dtype=numpy.float64)
+            secure = numpy.array(secure, dtype=numpy.bool_)
+            httponly = numpy.array(httponly, dtype=numpy.bool_)
+            domain_codes = numpy.array(domain_codes, dtype=numpy.int32)
+        return cls(names, expires, issue_times, secure, httponly,
+            domain_codes, domains, use_numpy)
+    
+    def __len__(self):
+        return len(self.names)
+    
+    def valid_mask(self, now=None):
+        '''Returns a boolean mask of cookies that have not expired.
+        
+        Session cookies are always valid.
+        '''
+        
+        if now is None:
+            now = time.time()
+        if self.use_numpy:
+            return numpy.isnan(self.expires) | (self.expires > now)
+        # NaN compares unequal to itself
+        return [expires != expires or expires > now for expires in self.expires]
+    
+    def expiring_within(self, seconds, now=None):
+        '''Returns a boolean mask of cookies that are still valid but
+        expire within the given number of seconds.
+        
+        Session cookies are not included.
+        '''
+        
+        if now is None:
+            now = time.time()
+        deadline = now + seconds
+        if self.use_numpy:
+            return (self.expires > now) & (self.expires <= deadline)
+        return [now < expires <= deadline for expires in self.expires]
+    
+    def expiry_histogram(self, bin_edges, now=None):
+        '''Counts cookies by remaining lifetime.
+        
+        bin_edges is an increasing sequence of lifetimes in seconds;
+        the result is a list of len(bin_edges) - 1 counts, the i-th count being
+        the number of cookies whose remaining lifetime falls into
+        [bin_edges[i], bin_edges[i + 1]). The last bin is closed on
+        the right, as with numpy.histogram. Session cookies are not counted.
+        '''
+        
+        if now is None:
+            now = time.time()
+        if self.use_numpy:
+            lifetimes = self.expires[~numpy.isnan(self.expires)] - now
+            counts, _ = numpy.histogram(lifetimes, bins=numpy.asarray(bin_edges, dtype=numpy.float64))
+            return counts.tolist()
+        
+        import bisect
+        bin_edges = list(bin_edges)
+        last = len(bin_edges) - 2
+        counts = [0] * (last + 1)
+        for expires in self.expires:
+            if expires != expires:
+                continue
+            lifetime = expires - now
+            if lifetime == bin_edges[-1]:
+                counts[last] += 1
+                continue
+            index = bisect.bisect_right(bin_edges, lifetime) - 1
+            if 0 <= index <= last:
+                counts[index] += 1
+        return counts
+    
+    def count_by_domain(self, mask=None):
+        '''Returns a dictionary mapping domains to the number of cookies
+        set for each domain, optionally restricted to cookies selected
+        by mask.
+        
+        Cookies without a domain are counted under None.
+        '''
+        
+        if self.use_numpy:
+            codes = self.domain_codes
+            if mask is not None:
+                codes = codes[numpy.asarray(mask, dtype=numpy.bool_)]
+            # shift by one so that cookies without a domain land in bin 0
+            counts = numpy.bincount(codes + 1, minlength=len(self.domains) + 1)
+            pairs = zip([None] + self.domains, counts.tolist())
+        else:
+            counts = [0] * (len(self.domains) + 1)
+            if mask is None:
+                for code in self.domain_codes:
+                    counts[code + 1] += 1
+            else:
+                for code, selected in zip(self.domain_codes, mask):
+                    if selected:
+                        counts[code + 1] += 1
+            pairs = zip([None] + self.domains, counts)
+        return dict((domain, count) for domain, count in pairs if count)
+    
+    def select_names(self, mask):
+        '''Returns names of cookies selected by mask.'''
+        
+        return [name for name, selected in zip(self.names, mask) if selected]
+
+def purge_expired(cookie_jar, now=None):
+    '''Removes all expired cookies from cookie_jar in one pass.
+    
+    Returns the number of cookies removed.
+    '''
+    
+    columns = cookie_jar.to_columns()
+    if columns.use_numpy:
+        expired = ~columns.valid_mask(now)
+    else:
+        expired = [not valid for valid in columns.valid_mask(now)]
+    names = columns.select_names(expired)
+    for name in names:
+        del cookie_jar[name]
+    return len(names)
@@ -1,15 +1,19 @@
 import sys
+import ocookie
 from . import CookieParser
 
 py3 = sys.version_info[0] == 3
 
 # possibly needed in python 2 only
-def parse_cookies(httplib_set_cookie_headers):
+def parse_cookies(httplib_set_cookie_headers, parser=CookieParser):
     '''Parses a list of Set-Cookie and Set-Cookie2 headers.
     
     httplib_set_cookie_headers is a sequence of strings, each string being
     a full header string (e.g. "Set-Cookie: foo=bar; path=/").
     
+    parser is an object with a parse_set_cookie_value method, such as
+    CookieParser or ocookie.cache.SetCookieParseCache.
+    
     Returns a list of Cookie instances.
     '''
     
@@ -18,7 +22,7 @@ def parse_cookies(httplib_set_cookie_headers):
         header = header.strip()
         name, value = header.split(' ', 1)
         value = value.strip()
-        cookie = CookieParser.parse_set_cookie_value(value)
+        cookie = parser.parse_set_cookie_value(value)
         cookies.append(cookie)
     return cookies
 
@@ -42,19 +46,32 @@ def parse_cookies(httplib_set_cookie_headers):
 # Additionally, get_all returns None by default if there are no
 # matching headers.
 if py3:
-    def parse_response_cookies(httplib_response):
+    def parse_response_cookies(httplib_response, parser=CookieParser):
+        tracer = ocookie.tracer
+        if tracer is not None:
+            start = tracer.clock()
         values = httplib_response.msg.get_all('set-cookie', [])
         values.extend(httplib_response.msg.get_all('set-cookie2', []))
-        cookies = [CookieParser.parse_set_cookie_value(value) for value in values]
+        if tracer is not None:
+            tracer.record('extract', start)
+        cookies = [parser.parse_set_cookie_value(value) for value in values]
         return cookies
 else:
-    def parse_response_cookies(httplib_response):
+    def parse_response_cookies(httplib_response, parser=CookieParser):
+        tracer = ocookie.tracer
+        if tracer is not None:
+            start = tracer.clock()
         headers = httplib_response.msg.getallmatchingheaders('set-cookie')
         headers.extend(httplib_response.msg.getallmatchingheaders('set-cookie2'))
-        return parse_cookies(headers)
+        if tracer is not None:
+            tracer.record('extract', start)
+        return parse_cookies(headers, parser)
 
 parse_response_cookies.__doc__ = '''
 Parses cookies in an httplib Response.
 
+parser is an object with a parse_set_cookie_value method, such as
+CookieParser or ocookie.cache.SetCookieParseCache.
+
 Returns a list of Cookie instances.
 '''
@@ -0,0 +1,189 @@
+'''Public suffix list support.
+
+A public suffix is a domain under which anyone may register names,
+such as com or co.uk. Cookies whose domain attribute is a public suffix
+("supercookies") would be sent to every site under that suffix and must
+not be accepted (RFC 6265 section 5.3, step 5).
+
+PublicSuffixList reads the list maintained at https://publicsuffix.org/
+from a local file and compiles its rules into a trie of domain labels,
+rightmost label first, so that looking up a host name takes time
+proportional to the number of labels in it. The compiled trie can be
+cached on disk:
+
+    psl = PublicSuffixList.load('public_suffix_list.dat',
+        cache_path='public_suffix_list.cache')
+    jar = CookieJar(public_suffix_list=psl)
+
+Host names are expected in ASCII (punycode) form. Rules containing
+other characters are converted to punycode when the list is compiled.
+'''
+
+import marshal
+import os
+
+from . import CookieError
+
+# Trie node keys: a child node per label, '*' for wildcard rules and
+# '!label' for exception rules. TERMINAL marks nodes ending a rule.
+TERMINAL = ''
+
+CACHE_FORMAT = 2
+
+class PublicSuffixList(object):
+    '''A compiled public suffix list.'''
+    
+    def __init__(self, trie):
+        self.trie = trie
+    
+    @classmethod
+    def parse(cls, text):
+        '''Compiles the rules in text, in public suffix list format.'''
+        
+        trie = {}
+        for line in text.splitlines():
+            # rules end at the first whitespace
+            fields = line.split()
+            if not fields or fields[0].startswith('//'):
+                continue
+            rule = to_ascii(fields[0].lower())
+            exception = rule.startswith('!')
+            if exception:
+                rule = rule[1:]
+            labels = rule.split('.')
+            if exception:
+                labels[0] = '!' + labels[0]
+            node = trie
+            for label in reversed(labels):
+                node = node.setdefault(label, {})
+            node[TERMINAL] = True
+        return cls(trie)
+    
+    @classmethod
+    def load(cls, path, cache_path=None):
+        '''Loads the public suffix list file at path.
+        
+        If cache_path is given, the compiled list is read from cache_path
+        when it was compiled from the current version of path, and written
+        to cache_path otherwise. Failure to write the cache is ignored.
+        '''
+        
+        stat = os.stat(path)
+        try:
+            mtime_ns = stat.st_mtime_ns
+        except AttributeError:
+            # before 3.3
+            mtime_ns = int(stat.st_mtime * 1e9)
+        source = [stat.st_size, mtime_ns]
+        if cache_path is not None:
+            try:
+                # marshal.load on a file object reads in small pieces,
+                # reading the whole file first is several times faster
+                with open(cache_path, 'rb') as f:
+                    cached = marshal.loads(f.read())
+            except (IOError, OSError, EOFError, ValueError, TypeError):
+                cached = None
+            if isinstance(cached, dict) and cached.get('format') == CACHE_FORMAT and cached.get('source') == source:
+                return cls(cached['trie'])
+        
+        with open(path, 'rb') as f:
+            psl = cls.parse(f.read().decode('utf8'))
+        
+        if cache_path is not None:
+            data = marshal.dumps({'format': CACHE_FORMAT, 'source': source, 'trie': psl.trie})
+            temp_path = cache_path + '.tmp%d' % os.getpid()
+            try:
+                with open(temp_path, 'wb') as f:
+                    f.write(data)
+                os.rename(temp_path, cache_path)
+            except (IOError, OSError):
+                pass
+        return psl
+    
+    def public_suffix_length(self, labels):
+        '''Returns the number of rightmost labels in labels (a list of
+        lowercase domain labels) that form the public suffix.
+        '''
+        
+        # the implicit "*" rule: an unlisted top level domain is a suffix
+        length = 1
+        exception_length = None
+        # trie nodes of all rules matching the labels seen so far; a label
+        # can match both an explicit rule and a wildcard rule
+        nodes = [self.trie]
+        depth = 0
+        for index in range(len(labels) - 1, -1, -1):
+            label = labels[index]
+            depth += 1
+            matched = []
+            for node in nodes:
+                exception = node.get('!' + label)
+                if exception is not None and TERMINAL in exception:
+                    # exception rules exclude their leftmost label
+                    exception_length = depth - 1
+                child = node.get(label)
+                if child is not None:
+                    matched.append(child)
+                child = node.get('*')
+                if child is not None:
+                    matched.append(child)
+            if not matched:
+                break
+            for child in matched:
+                if TERMINAL in child:
+                    length = depth
+            nodes = matched
+        if exception_length is not None:
+            # exception rules prevail
+            return exception_length
+        return length
+    
+    def public_suffix(self, host):
+        '''Returns the public suffix of host.'''
+        
+        labels = split_host(host)
+        return '.'.join(labels[len(labels) - self.public_suffix_length(labels):])
+    
+    def is_public_suffix(self, domain):
+        '''Returns whether domain (e.g. co.uk or .co.uk) is a public suffix.'''
+        
+        labels = split_host(domain)
+        if not labels:
+            return False
+        return self.public_suffix_length(labels) >= len(labels)
+    
+    def registrable_domain(self, host):
+        '''Returns the public suffix of host plus one label, e.g.
+        example.co.uk for www.example.co.uk, or None if host is itself
+        a public suffix.
+        '''
+        
+        labels = split_host(host)
+        length = self.public_suffix_length(labels)
+        if length >= len(labels):
+            return None
+        return '.'.join(labels[len(labels) - length - 1:])
+
+def split_host(host):
+    host = host.lower().strip('.')
+    if not host:
+        return []
+    return host.split('.')
+
+def to_ascii(rule):
+    try:
+        rule.encode('ascii')
+        return rule
+    except UnicodeError:
+        pass
+    labels = []
+    for label in rule.split('.'):
+        prefix = ''
+        if label.startswith('!'):
+            prefix, label = '!', label[1:]
+        try:
+            label = label.encode('idna').decode('ascii')
+        except UnicodeError:
+            raise CookieError('Invalid public suffix rule: %s' % rule)
+        labels.append(prefix + label)
+    return '.'.join(labels)
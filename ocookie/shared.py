@@ -0,0 +1,556 @@
+'''A cookie jar shared between processes.
+
+SharedCookieJar keeps its cookies in a multiprocessing.shared_memory
+block, so that all worker processes of a prefork pool see the same
+cookies: a cookie added by one worker is sent by every worker.
+
+The shared memory block holds a fixed capacity open addressing hash
+table (linear probing, tombstones for deleted entries) of fixed size
+cookie records. Writers serialize on a multiprocessing lock. Every record
+carries a sequence number which writers make odd while the record is
+being changed, and readers retry reading a record until they observe
+the same even sequence number before and after reading it (a seqlock).
+
+Once tombstones outnumber empty slots, the writer deleting a cookie
+rebuilds the table, reinserting the cookies in use, so that lookups
+keep ending at an empty slot. The table carries a sequence number of
+its own, odd during a rebuild; readers retry lookups that miss and
+scans of the table that overlap a rebuild.
+
+IMPORTANT: lock free reads are only correct where stores to shared memory
+become visible to other processors in program order, as they do on x86.
+Python offers no memory barriers, so on other architectures (ARM, POWER)
+a reader could see a new sequence number together with stale data.
+There readers take the lock as well, which is correct but slower;
+see the lock_free_reads argument of SharedCookieJar.
+
+A worker killed while changing the jar (e.g. by a prefork server's
+timeout) leaves the lock held and possibly a record marked as being
+changed. Operations then fail with CookieError after timeout seconds
+instead of waiting forever; the jar must be recreated.
+
+Create the jar in the parent process before starting workers:
+
+    jar = SharedCookieJar(capacity=4096)
+    # fork workers, or pass jar to multiprocessing.Process as an argument
+    ...
+    jar.close()
+    jar.unlink()
+'''
+
+import contextlib
+import platform
+import re
+import struct
+import time
+import zlib
+import multiprocessing
+
+try:
+    from multiprocessing import shared_memory
+except ImportError:
+    # before 3.8
+    shared_memory = None
+
+from . import CookieError, CookieDict, CookieJar, CookieParser, LiveCookie, \
+    format_set_cookie_attributes, format_set_cookie_extensions
+
+MAGIC = b'OCOOKIE2'
+# magic, capacity, slot size
+TABLE_HEADER = struct.Struct('<8sII')
+TABLE_HEADER_SIZE = 64
+# incremented after every change to the table, lets readers reuse
+# header values built from an unchanged table
+GENERATION = struct.Struct('<Q')
+GENERATION_OFFSET = TABLE_HEADER.size
+# slots in use, tombstones
+COUNTS = struct.Struct('<II')
+COUNTS_OFFSET = GENERATION_OFFSET + GENERATION.size
+# table sequence number, odd while the table is being rebuilt
+REBUILD_OFFSET = COUNTS_OFFSET + COUNTS.size
+# sequence, state, flags, name length, value length, attributes length,
+# path length, issue time, expiration time (NaN for session cookies)
+SLOT_HEADER = struct.Struct('<IBBHHHHdd')
+SEQUENCE = struct.Struct('<I')
+
+EMPTY = 0
+USED = 1
+DELETED = 2
+
+# the cookie has an empty value and is not sent in Cookie headers
+FLAG_EMPTY_VALUE = 1
+
+NAN = float('nan')
+
+# Machines with a memory model strong enough for lock free reads
+LOCK_FREE_READ_MACHINES = frozenset([
+    'x86_64', 'amd64', 'x86', 'i386', 'i486', 'i586', 'i686',
+])
+
+# Scanning tables: translating a byte with ODD gives 1 if it is odd
+# and 0 otherwise; NONZERO matches bytes other than 0 (EMPTY)
+ODD = bytes(bytearray(i & 1 for i in range(256)))
+NONZERO = re.compile(b'[^\\x00]')
+
+# Number of times a reader retries a record being changed before it
+# starts sleeping between retries
+SPIN_LIMIT = 1000
+
+class SharedCookieJar(CookieJar):
+    '''A CookieJar stored in shared memory.
+    
+    capacity is the number of cookies the jar can hold and slot_size the
+    space available for each cookie's name, value and attributes, in bytes,
+    excluding a small fixed size record header. Both are fixed when the
+    jar is created.
+    
+    Cookies returned by the jar are copies; changing them does not change
+    the jar. Use add to store changes.
+    
+    lock defaults to a new multiprocessing.Lock. When worker processes are
+    started through a multiprocessing context other than the default one,
+    pass a lock created by that context.
+    
+    timeout is the number of seconds to wait for the lock, or for
+    a record being changed by another process, before raising CookieError.
+    
+    lock_free_reads selects whether readers skip the lock. The default is
+    True on x86 and False elsewhere; see the module documentation.
+    '''
+    
+    def __init__(self, capacity=1024, slot_size=512, name=None, lock=None,
+        public_suffix_list=None, timeout=10.0, lock_free_reads=None, _create=True
+    ):
+        if shared_memory is None:
+            raise RuntimeError('SharedCookieJar requires multiprocessing.shared_memory (Python 3.8+)')
+        
+        if lock is None:
+            lock = multiprocessing.Lock()
+        if lock_free_reads is None:
+            lock_free_reads = platform.machine().lower() in LOCK_FREE_READ_MACHINES
+        self.lock = lock
+        self.public_suffix_list = public_suffix_list
+        self.timeout = timeout
+        self.lock_free_reads = lock_free_reads
+        if _create:
+            if slot_size <= SLOT_HEADER.size:
+                raise ValueError('slot_size must be greater than %d' % SLOT_HEADER.size)
+            size = TABLE_HEADER_SIZE + capacity * slot_size
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+            TABLE_HEADER.pack_into(self.shm.buf, 0, MAGIC, capacity, slot_size)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            magic, capacity, slot_size = TABLE_HEADER.unpack_from(self.shm.buf, 0)
+            if magic != MAGIC:
+                raise CookieError('Not a shared cookie jar: %s' % name)
+        self.capacity = capacity
+        self.slot_size = slot_size
+        # per process cache of built header values: generation,
+        # earliest expiration time of cookies included, values by max_size
+        self._header_cache = (None, None, {})
+    
+    @classmethod
+    def attach(cls, name, lock, public_suffix_list=None, timeout=10.0, lock_free_reads=None):
+        '''Opens an existing shared jar by shared memory block name.
+        
+        lock must be the lock of the jar being attached to.
+        '''
+        
+        return cls(name=name, lock=lock, public_suffix_list=public_suffix_list,
+            timeout=timeout, lock_free_reads=lock_free_reads, _create=False)
+    
+    def __reduce__(self):
+        # allows passing the jar to multiprocessing.Process
+        return (self.__class__.attach, (self.name, self.lock, self.public_suffix_list,
+            self.timeout, self.lock_free_reads))
+    
+    @property
+    def name(self):
+        return self.shm.name
+    
+    def close(self):
+        '''Detaches this process from the shared memory block.'''
+        
+        self.shm.close()
+    
+    def unlink(self):
+        '''Destroys the shared memory block. Call once, from the creator.'''
+        
+        self.shm.unlink()
+    
+    # Locking
+    
+    @contextlib.contextmanager
+    def _locked(self):
+        if not self.lock.acquire(True, self.timeout):
+            raise CookieError('Timed out waiting for the shared cookie jar lock; '
+                'a process may have died while changing the jar')
+        try:
+            yield
+        finally:
+            self.lock.release()
+    
+    def _reading(self):
+        if self.lock_free_reads:
+            return contextlib.nullcontext()
+        return self._locked()
+    
+    # Record access
+    
+    def _offset(self, index):
+        return TABLE_HEADER_SIZE + index * self.slot_size
+    
+    def _read_header(self, offset):
+        '''Returns a consistent snapshot of the header of the record at
+        offset, along with its data if the record is in use.
+        '''
+        
+        buf = self.shm.buf
+        spins = 0
+        deadline = None
+        while True:
+            header = SLOT_HEADER.unpack_from(buf, offset)
+            sequence = header[0]
+            if sequence & 1:
+                # write in progress, or a writer died mid-write
+                spins, deadline = self._wait(spins, deadline)
+                continue
+            if header[1] == USED:
+                start = offset + SLOT_HEADER.size
+                data = bytes(buf[start:start + header[3] + 1 + header[4] + header[5]])
+            else:
+                data = None
+            if SEQUENCE.unpack_from(buf, offset)[0] == sequence:
+                return header, data
+    
+    def _wait(self, spins, deadline):
+        '''Waits for a writer to finish, returning the updated
+        (spins, deadline) pair.
+        '''
+        
+        spins += 1
+        if spins > SPIN_LIMIT:
+            now = time.time()
+            if deadline is None:
+                deadline = now + self.timeout
+            elif now > deadline:
+                raise CookieError('Timed out reading a shared cookie jar record; '
+                    'a process may have died while changing the jar')
+            time.sleep(0.001)
+        return spins, deadline
+    
+    def _table_sequence(self):
+        '''Returns the table sequence number, waiting for a rebuild
+        in progress to finish.
+        '''
+        
+        buf = self.shm.buf
+        spins = 0
+        deadline = None
+        while True:
+            sequence = SEQUENCE.unpack_from(buf, REBUILD_OFFSET)[0]
+            if not sequence & 1:
+                return sequence
+            spins, deadline = self._wait(spins, deadline)
+    
+    def _find(self, name_bytes):
+        '''Returns (index, header, data) of the record for name_bytes,
+        or (None, None, None) if there is no such record.
+        '''
+        
+        while True:
+            sequence = self._table_sequence()
+            index, header, data = self._probe(name_bytes)
+            # records found are consistent even if a rebuild moved them,
+            # but a rebuild may have hidden the record from the probe
+            if index is not None or SEQUENCE.unpack_from(self.shm.buf, REBUILD_OFFSET)[0] == sequence:
+                return index, header, data
+    
+    def _probe(self, name_bytes):
+        capacity = self.capacity
+        index = zlib.crc32(name_bytes) % capacity
+        name_length = len(name_bytes)
+        for probe in range(capacity):
+            header, data = self._read_header(self._offset(index))
+            state = header[1]
+            if state == EMPTY:
+                break
+            if state == USED and header[3] == name_length and data[:name_length] == name_bytes:
+                return index, header, data
+            index = (index + 1) % capacity
+        return None, None, None
+    
+    def _write(self, index, state, flags=0, lengths=(0, 0, 0, 0), issue_time=0.0, expires=NAN, data=b''):
+        buf = self.shm.buf
+        offset = self._offset(index)
+        sequence = SEQUENCE.unpack_from(buf, offset)[0]
+        SEQUENCE.pack_into(buf, offset, (sequence + 1) & 0xffffffff)
+        start = offset + SLOT_HEADER.size
+        buf[start:start + len(data)] = data
+        SLOT_HEADER.pack_into(buf, offset, (sequence + 1) & 0xffffffff, state, flags,
+            lengths[0], lengths[1], lengths[2], lengths[3], issue_time, expires)
+        SEQUENCE.pack_into(buf, offset, (sequence + 2) & 0xffffffff)
+        generation = GENERATION.unpack_from(buf, GENERATION_OFFSET)[0]
+        GENERATION.pack_into(buf, GENERATION_OFFSET, (generation + 1) & 0xffffffffffffffff)
+    
+    def _make_cookie(self, header, data):
+        value_start = header[3] + 1
+        attributes_start = value_start + header[4]
+        name = data[:header[3]].decode('utf8')
+        value = data[value_start:attributes_start].decode('utf8')
+        attributes_text = data[attributes_start:].decode('utf8')
+        extensions = None
+        if attributes_text:
+            # the lenient parser keeps extension attributes
+            parsed, warnings = CookieParser.parse_set_cookie_value_lenient('x=y' + attributes_text)
+            attributes = parsed.attributes
+            extensions = parsed.extensions
+        else:
+            attributes = {}
+        cookie = LiveCookie(name, value, **attributes)
+        cookie.issue_time = header[7]
+        if extensions is not None:
+            cookie.extensions = extensions
+        return cookie
+    
+    # CookieJar interface
+    
+    def __iter__(self):
+        return iter(self.keys())
+    
+    def __contains__(self, name):
+        with self._reading():
+            index, header, data = self._find(name.encode('utf8'))
+        return index is not None
+    
+    def __getitem__(self, name):
+        with self._reading():
+            index, header, data = self._find(name.encode('utf8'))
+        if index is None:
+            raise KeyError(name)
+        return self._make_cookie(header, data)
+    
+    def __delitem__(self, name):
+        name_bytes = name.encode('utf8')
+        with self._locked():
+            index, header, data = self._find(name_bytes)
+            if index is None:
+                raise KeyError(name)
+            self._delete(index)
+    
+    def _delete(self, index):
+        '''Replaces the record at index with a tombstone, rebuilding the
+        table once tombstones outnumber empty slots. Must be called with
+        the lock held.
+        '''
+        
+        buf = self.shm.buf
+        used, tombstones = COUNTS.unpack_from(buf, COUNTS_OFFSET)
+        self._write(index, DELETED)
+        used -= 1
+        tombstones += 1
+        COUNTS.pack_into(buf, COUNTS_OFFSET, used, tombstones)
+        if tombstones > self.capacity - used - tombstones:
+            self._rebuild()
+    
+    def _rebuild(self):
+        '''Reinserts the records in use into a table without tombstones.
+        Must be called with the lock held.
+        '''
+        
+        buf = self.shm.buf
+        sequence = SEQUENCE.unpack_from(buf, REBUILD_OFFSET)[0]
+        SEQUENCE.pack_into(buf, REBUILD_OFFSET, (sequence + 1) & 0xffffffff)
+        records = self._scan()
+        for index in range(self.capacity):
+            header, data = self._read_header(self._offset(index))
+            if header[1] != EMPTY:
+                self._write(index, EMPTY)
+        for header, data in records:
+            index = self._free_slot(data[:header[3]])
+            self._write(index, USED, header[2], header[3:7], header[7], header[8], data)
+        COUNTS.pack_into(buf, COUNTS_OFFSET, len(records), 0)
+        SEQUENCE.pack_into(buf, REBUILD_OFFSET, (sequence + 2) & 0xffffffff)
+    
+    def add(self, cookie, request_host=None):
+        '''Adds a cookie to the cookie jar.
+        
+        See CookieJar.add. Raises CookieError if the cookie does not fit
+        into a slot or the jar is full.
+        '''
+        
+        if not isinstance(cookie, LiveCookie):
+            extensions = cookie.extensions
+            cookie = LiveCookie(cookie.name, cookie.value, **cookie.attributes)
+            if extensions is not None:
+                cookie.extensions = extensions
+        if self.public_suffix_list is not None:
+            cookie = self._check_domain(cookie, request_host)
+            if cookie is None:
+                return
+        name_bytes = cookie.name.encode('utf8')
+        
+        if not cookie.valid():
+            with self._locked():
+                index, header, data = self._find(name_bytes)
+                if index is not None:
+                    self._delete(index)
+            return
+        
+        value_bytes = (cookie.value or '').encode('utf8')
+        attributes_text = format_set_cookie_attributes(cookie.attributes)
+        if cookie.extensions:
+            attributes_text += format_set_cookie_extensions(cookie.extensions)
+        attributes_bytes = attributes_text.encode('utf8')
+        data = name_bytes + b'=' + value_bytes + attributes_bytes
+        if SLOT_HEADER.size + len(data) > self.slot_size:
+            raise CookieError('Cookie too large for shared jar slot: %s' % cookie.name)
+        flags = 0
+        if not cookie.cookie_header_fragment:
+            flags |= FLAG_EMPTY_VALUE
+        path = cookie.attributes.get('path') or ''
+        expires = cookie.expires_timestamp
+        if expires is None:
+            expires = NAN
+        lengths = (len(name_bytes), len(value_bytes), len(attributes_bytes), len(path))
+        
+        with self._locked():
+            index, header, old_data = self._find(name_bytes)
+            if index is None:
+                index = self._free_slot(name_bytes)
+                buf = self.shm.buf
+                used, tombstones = COUNTS.unpack_from(buf, COUNTS_OFFSET)
+                if self._read_header(self._offset(index))[0][1] == DELETED:
+                    tombstones -= 1
+                COUNTS.pack_into(buf, COUNTS_OFFSET, used + 1, tombstones)
+            self._write(index, USED, flags, lengths, cookie.issue_time, expires, data)
+    
+    def _free_slot(self, name_bytes):
+        capacity = self.capacity
+        index = zlib.crc32(name_bytes) % capacity
+        for probe in range(capacity):
+            header, data = self._read_header(self._offset(index))
+            if header[1] != USED:
+                return index
+            index = (index + 1) % capacity
+        raise CookieError('Shared cookie jar is full')
+    
+    def _records(self):
+        '''Returns (header, data) of records in use.
+        
+        Only the used part of each occupied slot is copied.
+        '''
+        
+        while True:
+            sequence = self._table_sequence()
+            records = self._scan()
+            # a rebuild moving records could have shown some twice
+            # or not at all
+            if SEQUENCE.unpack_from(self.shm.buf, REBUILD_OFFSET)[0] == sequence:
+                return records
+    
+    def _scan(self):
+        buf = self.shm.buf
+        slot_size = self.slot_size
+        end = TABLE_HEADER_SIZE + self.capacity * slot_size
+        # the low byte of each sequence number and each state byte,
+        # which follows the sequence number; empty slots being written
+        # to have odd sequence numbers
+        sequences = bytes(buf[TABLE_HEADER_SIZE:end:slot_size])
+        states = bytes(buf[TABLE_HEADER_SIZE + 4:end:slot_size])
+        # find the slots of interest without a Python level loop
+        # over the whole table
+        indices = set(match.start() for match in NONZERO.finditer(states))
+        indices.update(match.start() for match in NONZERO.finditer(sequences.translate(ODD)))
+        records = []
+        for index in sorted(indices):
+            header, data = self._read_header(TABLE_HEADER_SIZE + index * slot_size)
+            if header[1] == USED:
+                records.append((header, data))
+        return records
+    
+    @property
+    def cookie_dict(self):
+        '''A snapshot of the jar's cookies, as a CookieDict.'''
+        
+        with self._reading():
+            records = self._records()
+        cookie_dict = CookieDict()
+        for header, data in records:
+            cookie = self._make_cookie(header, data)
+            cookie_dict[cookie.name] = cookie
+        return cookie_dict
+    
+    def keys(self):
+        with self._reading():
+            records = self._records()
+        return [data[:header[3]].decode('utf8') for header, data in records]
+    
+    def build_cookie_header_value(self, max_size=None):
+        '''Creates value for a Cookie header from cookies currently in the jar.
+        
+        See CookieJar.build_cookie_header_value.
+        '''
+        
+        if self.lock_free_reads:
+            return self._build_cookie_header_value(max_size)
+        with self._locked():
+            return self._build_cookie_header_value(max_size)
+    
+    def _build_cookie_header_value(self, max_size):
+        now = time.time()
+        generation = GENERATION.unpack_from(self.shm.buf, GENERATION_OFFSET)[0]
+        cached_generation, next_expiration, values = self._header_cache
+        if generation == cached_generation and now < next_expiration:
+            try:
+                return values[max_size]
+            except KeyError:
+                pass
+        else:
+            values = {}
+        records = self._records()
+        
+        fragments = []
+        next_expiration = float('inf')
+        for header, data in records:
+            expires = header[8]
+            # NaN compares unequal to itself
+            if header[2] & FLAG_EMPTY_VALUE or (expires == expires and expires <= now):
+                continue
+            if expires < next_expiration:
+                next_expiration = expires
+            fragment = data[:header[3] + 1 + header[4]].decode('utf8')
+            if max_size is None:
+                fragments.append(fragment)
+            else:
+                # records store fragments UTF-8 encoded, so their
+                # size in bytes is known without encoding them again
+                fragments.append(((-header[6], header[7]), header[3] + 1 + header[4], fragment))
+        
+        if max_size is None:
+            value = '; '.join(fragments)
+        else:
+            fragments.sort(key=lambda item: item[0])
+            selected = []
+            size = -2
+            for key, fragment_size, fragment in fragments:
+                # 2 for the '; ' separator
+                size += fragment_size + 2
+                if size > max_size:
+                    break
+                selected.append(fragment)
+            value = '; '.join(selected)
+        
+        # only cache if the table did not change while it was read
+        if GENERATION.unpack_from(self.shm.buf, GENERATION_OFFSET)[0] == generation:
+            values[max_size] = value
+            self._header_cache = (generation, next_expiration, values)
+        return value
+    
+    def clear(self):
+        with self._locked():
+            for index in range(self.capacity):
+                header, data = self._read_header(self._offset(index))
+                if header[1] != EMPTY:
+                    self._write(index, EMPTY)
+            COUNTS.pack_into(self.shm.buf, COUNTS_OFFSET, 0, 0)
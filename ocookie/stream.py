@@ -0,0 +1,178 @@
+'''Incremental parsing of Set-Cookie headers from raw response bytes.
+
+SetCookieStreamParser consumes an HTTP response header block in
+arbitrary chunks, as read from a socket, and produces cookies as soon
+as each Set-Cookie or Set-Cookie2 header is complete:
+
+    parser = SetCookieStreamParser(cookie_jar=jar)
+    while not parser.done:
+        parser.feed(sock.recv(4096))
+    body_start = parser.remainder
+
+A header is complete once the first byte of the following line has
+been seen, because that byte decides whether the header continues on
+the next line (obsolete line folding, RFC 7230 section 3.2.4).
+
+Set-Cookie headers that fail to parse are skipped and recorded in
+parser.errors, so that one bad cookie does not stop the rest of the
+response from being processed.
+'''
+
+from . import CookieError, CookieParser
+
+class SetCookieStreamParser(object):
+    '''A push parser extracting cookies from a response header block.
+    
+    The status line, if present, is skipped. Headers other than
+    Set-Cookie and Set-Cookie2 are skipped without being decoded.
+    
+    Parsed cookies are added to cookie_jar, if given, passed to callback,
+    if given, and returned from the feed call that completed them.
+    Headers that parser or cookie_jar reject with CookieError or
+    ValueError are appended to errors as (header value, exception)
+    tuples.
+    
+    max_line_size limits the length of a single physical header line and
+    max_header_size limits the length of the entire header block,
+    both in bytes; exceeding either raises CookieError. Cookies completed
+    earlier in the same chunk are added to cookie_jar and passed to
+    callback before the error is raised.
+    '''
+    
+    def __init__(self, cookie_jar=None, callback=None, parser=CookieParser,
+        max_line_size=8190, max_header_size=65536
+    ):
+        self.cookie_jar = cookie_jar
+        self.callback = callback
+        self.parser = parser
+        self.max_line_size = max_line_size
+        self.max_header_size = max_header_size
+        self.reset()
+    
+    def reset(self):
+        '''Prepares the parser for the next response on a connection.'''
+        
+        self._buffer = bytearray()
+        # list of physical lines making up the current cookie header,
+        # or False when the current header is not a cookie header,
+        # or None before the first header
+        self._pending = None
+        self._first_line = True
+        self.header_size = 0
+        self.done = False
+        self.status_line = None
+        self.remainder = b''
+        self.errors = []
+    
+    def feed(self, data):
+        '''Processes the next chunk of response bytes.
+        
+        Returns a list of cookies completed by this chunk.
+        '''
+        
+        if self.done:
+            raise CookieError('Header block is already complete')
+        
+        buffer = self._buffer
+        buffer.extend(data)
+        # values of cookie headers completed by this chunk, parsed only
+        # once the buffer no longer holds their lines
+        values = []
+        start = 0
+        while True:
+            end = buffer.find(b'\n', start)
+            if end < 0:
+                break
+            line_size = end + 1 - start
+            self.header_size += line_size
+            if line_size > self.max_line_size:
+                self._fail(values, buffer[start:start + 1],
+                    'Header line too long: %d bytes' % line_size)
+            if self.header_size > self.max_header_size:
+                self._fail(values, buffer[start:start + 1],
+                    'Header block too long: more than %d bytes' % self.max_header_size)
+            
+            line = bytes(buffer[start:end])
+            start = end + 1
+            if line.endswith(b'\r'):
+                line = line[:-1]
+            
+            if self._first_line:
+                self._first_line = False
+                if line.startswith(b'HTTP/'):
+                    self.status_line = line.decode('latin-1')
+                    continue
+            
+            if not line:
+                self._finish_header(values)
+                self.done = True
+                self.remainder = bytes(buffer[start:])
+                start = len(buffer)
+                break
+            
+            if line[:1] in (b' ', b'\t'):
+                # continuation of the previous header
+                if self._pending:
+                    self._pending.append(line.strip())
+                continue
+            
+            self._finish_header(values)
+            if line[:10].lower() == b'set-cookie':
+                self._pending = [line]
+            else:
+                self._pending = False
+        
+        if self._pending and start < len(buffer) and buffer[start:start + 1] not in (b' ', b'\t'):
+            # the next line has started and is not a continuation line,
+            # no need to wait for it to finish
+            self._finish_header(values)
+        
+        del buffer[:start]
+        if len(buffer) > self.max_line_size:
+            self._fail(values, buffer[:1],
+                'Header line too long: more than %d bytes' % self.max_line_size)
+        if self.header_size + len(buffer) > self.max_header_size:
+            self._fail(values, buffer[:1],
+                'Header block too long: more than %d bytes' % self.max_header_size)
+        
+        return self._emit(values)
+    
+    def _fail(self, values, next_byte, message):
+        '''Emits cookies completed so far, including a cookie header
+        ended by a line starting with next_byte, and raises CookieError.
+        '''
+        
+        if self._pending and next_byte and next_byte not in (b' ', b'\t'):
+            self._finish_header(values)
+        self._emit(values)
+        raise CookieError(message)
+    
+    def _emit(self, values):
+        '''Parses header values, returning the cookies they produce.'''
+        
+        cookies = []
+        for value in values:
+            try:
+                cookie = self.parser.parse_set_cookie_value(value)
+                if self.cookie_jar is not None:
+                    self.cookie_jar.add(cookie)
+            except (CookieError, ValueError) as e:
+                self.errors.append((value, e))
+                continue
+            if self.callback is not None:
+                self.callback(cookie)
+            cookies.append(cookie)
+        return cookies
+    
+    def _finish_header(self, values):
+        lines = self._pending
+        self._pending = None
+        if not lines:
+            return
+        
+        header = b' '.join(lines).decode('latin-1')
+        name, colon, value = header.partition(':')
+        name = name.strip().lower()
+        if name != 'set-cookie' and name != 'set-cookie2':
+            return
+        values.append(value.strip())
@@ -0,0 +1,159 @@
+'''Opt-in timing of the phases of cookie handling.
+
+When tracing is enabled, ocookie records how long each of the following
+phases takes, every time it runs:
+
+    extract    pulling Set-Cookie header values out of a response
+    tokenize   splitting a Set-Cookie value into name, value and attributes
+    date       parsing an expiration date
+    construct  creating Cookie and LiveCookie objects
+    insert     checking expiration and storing a cookie in a CookieJar
+
+Phases may nest: insert includes the date parsing needed to check
+expiration, for instance.
+
+Records go into a fixed size ring buffer, so that tracing a long running
+process uses bounded memory; once the buffer is full the oldest records
+are overwritten. Recording is thread safe; records carry the id of
+the thread that made them.
+
+    tracer = ocookie.tracing.enable()
+    ...
+    print(tracer.summary())
+    tracer.export_chrome_trace('cookies.json')
+    ocookie.tracing.disable()
+
+When tracing is disabled instrumented code only checks whether
+ocookie.tracer is None; this module is not imported until it is used.
+'''
+
+import threading
+import time
+
+import ocookie
+
+try:
+    from _thread import get_ident
+except ImportError:
+    # 2.x
+    from thread import get_ident
+
+class Tracer(object):
+    '''Records phase durations into a ring buffer of capacity records.'''
+    
+    def __init__(self, capacity=65536):
+        try:
+            self.clock = time.perf_counter_ns
+        except AttributeError:
+            raise RuntimeError('Tracing requires time.perf_counter_ns (Python 3.7+)')
+        self.capacity = capacity
+        self.phases = [None] * capacity
+        self.starts = [0] * capacity
+        self.durations = [0] * capacity
+        self.threads = [0] * capacity
+        # total number of records made, including overwritten ones
+        self.count = 0
+        self._lock = threading.Lock()
+    
+    def record(self, phase, start):
+        '''Records phase as running from start, a clock() value, until now.
+        
+        Returns the end time, so that consecutive phases can be recorded
+        with one clock reading between them.
+        '''
+        
+        end = self.clock()
+        thread = get_ident()
+        with self._lock:
+            index = self.count % self.capacity
+            self.count += 1
+            self.phases[index] = phase
+            self.starts[index] = start
+            self.durations[index] = end - start
+            self.threads[index] = thread
+        return end
+    
+    def records(self):
+        '''Returns retained records, oldest first, as
+        (phase, start_ns, duration_ns, thread_id) tuples.
+        '''
+        
+        with self._lock:
+            count = self.count
+            if count <= self.capacity:
+                indices = range(count)
+            else:
+                first = count % self.capacity
+                indices = list(range(first, self.capacity)) + list(range(first))
+            return [(self.phases[i], self.starts[i], self.durations[i], self.threads[i]) for i in indices]
+    
+    def summary(self, percentiles=(50, 90, 99)):
+        '''Returns a dictionary mapping each recorded phase to statistics
+        over retained records: count, total_ns, max_ns and pNN_ns for
+        each of the requested percentiles (nearest rank).
+        '''
+        
+        durations_by_phase = {}
+        for phase, start, duration, thread in self.records():
+            durations_by_phase.setdefault(phase, []).append(duration)
+        
+        summary = {}
+        for phase in durations_by_phase:
+            durations = sorted(durations_by_phase[phase])
+            count = len(durations)
+            stats = {
+                'count': count,
+                'total_ns': sum(durations),
+                'max_ns': durations[-1],
+            }
+            for percentile in percentiles:
+                # nearest rank
+                rank = max(int(-(-percentile * count // 100)), 1)
+                stats['p%s_ns' % percentile] = durations[rank - 1]
+            summary[phase] = stats
+        return summary
+    
+    def chrome_trace(self):
+        '''Returns retained records in Chrome trace event format,
+        as viewed in chrome://tracing or Perfetto.
+        '''
+        
+        import os
+        pid = os.getpid()
+        events = []
+        for phase, start, duration, thread in self.records():
+            events.append({
+                'name': phase,
+                'cat': 'ocookie',
+                'ph': 'X',
+                'ts': start / 1000.0,
+                'dur': duration / 1000.0,
+                'pid': pid,
+                'tid': thread,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ns'}
+    
+    def export_chrome_trace(self, path):
+        '''Writes retained records to path as a Chrome trace JSON file.'''
+        
+        import json
+        with open(path, 'w') as f:
+            json.dump(self.chrome_trace(), f)
+    
+    def clear(self):
+        with self._lock:
+            self.count = 0
+
+def enable(capacity=65536):
+    '''Starts recording into a new Tracer and returns it.'''
+    
+    tracer = Tracer(capacity)
+    ocookie.tracer = tracer
+    return tracer
+
+def disable():
+    '''Stops recording. Returns the Tracer that was active, if any.'''
+    
+    previous = ocookie.tracer
+    ocookie.tracer = None
+    return previous
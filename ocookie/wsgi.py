@@ -0,0 +1,84 @@
+'''WSGI middleware for reading request cookies and setting response cookies.
+
+CookieMiddleware places a CookieContext into the WSGI environ under
+the 'ocookie' key. Applications read request cookies from
+context.request_cookies and queue response cookies with
+context.set_cookie:
+
+    def app(environ, start_response):
+        context = environ['ocookie']
+        visited = 'visited' in context.request_cookies
+        context.set_cookie(ocookie.Cookie('visited', 'yes', path='/'))
+        start_response('200 OK', [('Content-Type', 'text/plain')])
+        return [b'ok']
+    
+    app = CookieMiddleware(app)
+
+The Cookie header is parsed on first access to request_cookies and
+the result is cached for the rest of the request, so requests that never
+look at cookies do not pay for parsing them.
+'''
+
+from . import CookieParser, CookieDict
+
+ENVIRON_KEY = 'ocookie'
+
+class CookieContext(object):
+    '''Per-request cookie state.'''
+    
+    def __init__(self, environ):
+        self.environ = environ
+        self._request_cookies = None
+        self.response_cookies = []
+    
+    @property
+    def request_cookies(self):
+        '''A CookieDict of cookies sent by the client.
+        
+        Parsed from HTTP_COOKIE on first access.
+        '''
+        
+        if self._request_cookies is None:
+            text = self.environ.get('HTTP_COOKIE')
+            if text:
+                self._request_cookies = CookieDict(CookieParser.parse_cookie_value(text))
+            else:
+                self._request_cookies = CookieDict()
+        return self._request_cookies
+    
+    def set_cookie(self, cookie):
+        '''Queues cookie to be sent in a Set-Cookie response header.
+        
+        Cookies must be set before the application calls start_response.
+        '''
+        
+        self.response_cookies.append(cookie)
+    
+    def set_cookie_headers(self):
+        return [('Set-Cookie', cookie.set_cookie_header_value()) for cookie in self.response_cookies]
+
+class CookieMiddleware(object):
+    '''WSGI middleware providing a CookieContext to the wrapped application.'''
+    
+    def __init__(self, app, environ_key=ENVIRON_KEY):
+        self.app = app
+        self.environ_key = environ_key
+    
+    def __call__(self, environ, start_response):
+        context = CookieContext(environ)
+        environ[self.environ_key] = context
+        
+        def cookie_start_response(status, headers, exc_info=None):
+            if context.response_cookies:
+                headers = list(headers) + context.set_cookie_headers()
+            if exc_info is None:
+                return start_response(status, headers)
+            else:
+                return start_response(status, headers, exc_info)
+        
+        return self.app(environ, cookie_start_response)
+
+def request_cookies(environ, environ_key=ENVIRON_KEY):
+    '''Returns the CookieDict of request cookies for environ.'''
+    
+    return environ[environ_key].request_cookies
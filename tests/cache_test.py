@@ -0,0 +1,82 @@
+import unittest
+
+import ocookie
+import ocookie.cache
+
+value = 'SERVERID=app3; path=/; domain=.example.com'
+
+class SetCookieParseCacheTest(unittest.TestCase):
+    def test_hit(self):
+        cache = ocookie.cache.SetCookieParseCache()
+        first = cache.parse_set_cookie_value(value)
+        second = cache.parse_set_cookie_value(value)
+        self.assertEqual('SERVERID', second.name)
+        self.assertEqual('app3', second.value)
+        self.assertEqual('/', second.path)
+        self.assertTrue(first is not second)
+        self.assertTrue(first.attributes is second.attributes)
+        self.assertEqual(1, cache.hits)
+        self.assertEqual(1, cache.misses)
+        self.assertEqual(0.5, cache.hit_rate)
+    
+    def test_copy_on_write(self):
+        cache = ocookie.cache.SetCookieParseCache()
+        first = cache.parse_set_cookie_value(value)
+        first.path = '/changed'
+        first.value = 'app4'
+        self.assertEqual('/changed', first.path)
+        
+        second = cache.parse_set_cookie_value(value)
+        self.assertEqual('/', second.path)
+        self.assertEqual('app3', second.value)
+        self.assertTrue(first.attributes is not second.attributes)
+    
+    def test_entry_limit(self):
+        cache = ocookie.cache.SetCookieParseCache(max_entries=2)
+        cache.parse_set_cookie_value('a=1')
+        cache.parse_set_cookie_value('b=1')
+        # a becomes most recently used
+        cache.parse_set_cookie_value('a=1')
+        cache.parse_set_cookie_value('c=1')
+        self.assertEqual(2, len(cache))
+        self.assertEqual(1, cache.evictions)
+        
+        cache.parse_set_cookie_value('a=1')
+        self.assertEqual(2, cache.hits)
+    
+    def test_byte_limit(self):
+        cache = ocookie.cache.SetCookieParseCache(max_bytes=8)
+        cache.parse_set_cookie_value('a=1234')
+        cache.parse_set_cookie_value('b=1234')
+        self.assertEqual(1, len(cache))
+        self.assertEqual(6, cache.size_bytes)
+        
+        cookie = cache.parse_set_cookie_value('toolong=1234')
+        self.assertEqual('toolong', cookie.name)
+        self.assertEqual(1, len(cache))
+        
+        # u'\xe9' is one character but two bytes
+        cache.clear()
+        cache.parse_set_cookie_value(u'a=123\xe9')
+        self.assertEqual(7, cache.size_bytes)
+        # 8 characters, 9 bytes
+        cache.parse_set_cookie_value(u'b=12345\xe9')
+        self.assertEqual(1, len(cache))
+        self.assertEqual(7, cache.size_bytes)
+    
+    def test_errors_are_not_cached(self):
+        cache = ocookie.cache.SetCookieParseCache()
+        for i in range(2):
+            self.assertRaises(ocookie.CookieError, cache.parse_set_cookie_value, 'a=b; bogus')
+        self.assertEqual(0, len(cache))
+        self.assertEqual(2, cache.misses)
+    
+    def test_jar(self):
+        cache = ocookie.cache.SetCookieParseCache()
+        cookie_jar = ocookie.CookieJar()
+        cookie_jar.add(cache.parse_set_cookie_value(value))
+        cookie_jar['SERVERID'].path = '/jar'
+        self.assertEqual('/', cache.parse_set_cookie_value(value).path)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,70 @@
+import unittest
+
+import ocookie
+import ocookie.columns
+
+now = 1325376000
+
+def make_jar():
+    cookie_jar = ocookie.CookieJar()
+    cookie_jar.add(ocookie.Cookie('session', 'a', domain='.a.com'))
+    cookie_jar.add(ocookie.Cookie('day', 'b', domain='.a.com', httponly=True, max_age=86400))
+    cookie_jar.add(ocookie.Cookie('week', 'c', domain='.b.com', secure=True,
+        expires='Sun, 01 Jan 2040 00:00:00 GMT'))
+    cookie_jar.add(ocookie.Cookie('nodomain', 'd', expires='Sun, 01 Jan 2040 00:00:00 GMT'))
+    for cookie in cookie_jar.valid_cookies():
+        cookie.issue_time = now
+    return cookie_jar
+
+class ColumnsTestMixin(object):
+    use_numpy = None
+    
+    def setUp(self):
+        self.cookie_jar = make_jar()
+        self.columns = self.cookie_jar.to_columns(use_numpy=self.use_numpy)
+        self.index = dict((name, i) for i, name in enumerate(self.columns.names))
+    
+    def test_export(self):
+        columns = self.columns
+        self.assertEqual(4, len(columns))
+        self.assertTrue(columns.expires[self.index['session']] != columns.expires[self.index['session']])
+        self.assertEqual(now + 86400, columns.expires[self.index['day']])
+        self.assertEqual(2208988800, columns.expires[self.index['week']])
+        self.assertTrue(columns.secure[self.index['week']])
+        self.assertFalse(columns.secure[self.index['day']])
+        self.assertTrue(columns.httponly[self.index['day']])
+        self.assertEqual(-1, columns.domain_codes[self.index['nodomain']])
+        self.assertEqual('.b.com', columns.domains[columns.domain_codes[self.index['week']]])
+    
+    def test_valid_mask(self):
+        mask = self.columns.valid_mask(now + 2 * 86400)
+        self.assertEqual(['nodomain', 'session', 'week'], sorted(self.columns.select_names(mask)))
+    
+    def test_expiring_within(self):
+        mask = self.columns.expiring_within(7 * 86400, now=now)
+        self.assertEqual(['day'], self.columns.select_names(mask))
+        self.assertEqual({'.a.com': 1}, self.columns.count_by_domain(mask))
+    
+    def test_count_by_domain(self):
+        self.assertEqual({'.a.com': 2, '.b.com': 1, None: 1}, self.columns.count_by_domain())
+    
+    def test_expiry_histogram(self):
+        counts = self.columns.expiry_histogram([0, 86400, 2 * 86400, 10 ** 10], now=now)
+        self.assertEqual([0, 1, 2], counts)
+        self.assertTrue(isinstance(counts, list))
+    
+    def test_purge_expired(self):
+        purged = ocookie.columns.purge_expired(self.cookie_jar, now + 2 * 86400)
+        self.assertEqual(1, purged)
+        self.assertFalse('day' in self.cookie_jar)
+        self.assertTrue('session' in self.cookie_jar)
+
+class PurePythonColumnsTest(ColumnsTestMixin, unittest.TestCase):
+    use_numpy = False
+
+if ocookie.columns.numpy is not None:
+    class NumpyColumnsTest(ColumnsTestMixin, unittest.TestCase):
+        use_numpy = True
+
+if __name__ == '__main__':
+    unittest.main()
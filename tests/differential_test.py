@@ -0,0 +1,485 @@
+'''Differential tests of ocookie's parsers against the standard library.
+
+Randomized Set-Cookie and Cookie header values are generated from fixed
+seeds and parsed by ocookie.CookieParser and by the standard library
+(http.cookies.SimpleCookie and http.cookiejar.parse_ns_headers).
+Semantic differences are collected as mismatches; the tests fail on any
+mismatch not explained by an entry in known_divergences, and on entries
+that no longer explain any mismatch.
+
+Generated values vary quoting, '=' and ';' within values, non-ASCII
+characters, whitespace around '=' and ';', date layouts and extension
+attributes such as SameSite.
+
+Run this module directly to print all mismatches and a side by side
+throughput comparison:
+
+    python -m tests.differential_test [cases per seed]
+'''
+
+import random
+import sys
+import time
+import unittest
+
+import ocookie
+
+py3 = sys.version_info[0] == 3
+if py3:
+    import http.cookies as stdlib_cookies
+    import http.cookiejar as stdlib_cookiejar
+else:
+    import Cookie as stdlib_cookies
+    import cookielib as stdlib_cookiejar
+
+def native_text(text):
+    '''Returns text as the str type, which SimpleCookie.load requires;
+    on Python 2 SimpleCookie takes unicode text for a dict.
+    '''
+    
+    if not py3 and not isinstance(text, str):
+        text = text.encode('utf8')
+    return text
+
+seeds = (1, 2, 3)
+cases_per_seed = 200
+
+date_formats = (
+    ocookie.strftime_format,
+    ocookie.strftime_format2,
+    ocookie.strftime_format_netscape,
+    ocookie.strftime_format_netscape_short_year,
+)
+
+# Keep two digit years unambiguous for http.cookiejar, which resolves
+# them relative to the current year.
+min_timestamp = 631152000  # 1990-01-01
+max_timestamp = 2051222400  # 2035-01-01
+
+token_chars = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_'
+value_chars = token_chars + '-.:/+'
+non_ascii_chars = u'\xe9\xfc\u00df\u65e5\u672c'
+
+# SimpleCookie treats these as attributes rather than cookie names
+reserved_names = ('expires', 'path', 'comment', 'domain', 'max-age',
+    'secure', 'httponly', 'version', 'samesite')
+
+extension_attributes = ('SameSite=Lax', 'SameSite=None', 'Priority=High', 'Partitioned')
+
+# Generated values are returned with a set of features describing
+# the variations they contain, which is how known divergences are
+# recognized. Dates add a feature naming their format.
+date_features = {
+    ocookie.strftime_format: 'date-strftime_format',
+    ocookie.strftime_format2: 'date-strftime_format2',
+    ocookie.strftime_format_netscape: 'date-netscape',
+    ocookie.strftime_format_netscape_short_year: 'date-netscape-short-year',
+}
+
+def random_token(rng, chars=token_chars, min_length=1, max_length=12):
+    return ''.join(rng.choice(chars) for i in range(rng.randint(min_length, max_length)))
+
+def random_name(rng):
+    while True:
+        name = random_token(rng)
+        if name.lower() not in reserved_names:
+            return name
+
+def random_value(rng, features):
+    kind = rng.random()
+    if kind < 0.15:
+        features.add('equals-in-value')
+        return random_token(rng, value_chars) + '=' + random_token(rng, value_chars, 0)
+    if kind < 0.25:
+        features.add('quoted')
+        return '"' + random_token(rng, value_chars) + '"'
+    if kind < 0.3:
+        features.add('quoted-semicolon')
+        return '"' + random_token(rng, value_chars) + ';' + random_token(rng, value_chars) + '"'
+    if kind < 0.35:
+        features.add('quoted-space')
+        return '"' + random_token(rng, value_chars) + ' ' + random_token(rng, value_chars) + '"'
+    if kind < 0.4:
+        features.add('comma')
+        return random_token(rng, value_chars) + ',' + random_token(rng, value_chars)
+    if kind < 0.45:
+        features.add('non-ascii')
+        return random_token(rng, value_chars) + rng.choice(non_ascii_chars) + random_token(rng, value_chars, 0)
+    if kind < 0.48:
+        features.add('empty-value')
+        return ''
+    return random_token(rng, value_chars)
+
+def random_equals(rng, features, feature):
+    if rng.random() < 0.15:
+        features.add(feature)
+        return rng.choice([' =', '= ', ' = '])
+    return '='
+
+def random_separator(rng, features):
+    separator = rng.choice(['; ', '; ', ';', ' ; ', ' ;'])
+    if separator.startswith(' '):
+        features.add('space-before-semicolon')
+    return separator
+
+def random_case(rng, name):
+    choice = rng.randint(0, 2)
+    if choice == 0:
+        return name.lower()
+    if choice == 1:
+        return name.upper()
+    return '-'.join(part.capitalize() for part in name.split('-'))
+
+def random_date(rng):
+    date_format = rng.choice(date_formats)
+    timestamp = rng.randint(min_timestamp, max_timestamp)
+    # %Z is not portable with gmtime, cookies always use GMT
+    return time.strftime(date_format.replace('%Z', 'GMT'), time.gmtime(timestamp)), date_format
+
+def random_set_cookie(rng):
+    '''Returns a random Set-Cookie value and the set of its features.'''
+    
+    features = set()
+    attributes = []
+    if rng.random() < 0.5:
+        attributes.append(('path', '/' + random_token(rng, value_chars, 0, 8)))
+    if rng.random() < 0.4:
+        attributes.append(('domain', '.' + random_token(rng).lower() + '.com'))
+    if rng.random() < 0.5:
+        date, date_format = random_date(rng)
+        features.add(date_features[date_format])
+        attributes.append(('expires', date))
+    if rng.random() < 0.3:
+        attributes.append(('max-age', str(rng.randint(0, 10 ** 8))))
+    if rng.random() < 0.3:
+        attributes.append(('secure', None))
+    if rng.random() < 0.3:
+        attributes.append(('httponly', None))
+    rng.shuffle(attributes)
+    
+    text = random_name(rng) + random_equals(rng, features, 'space-around-equals') + random_value(rng, features)
+    for name, value in attributes:
+        text += random_separator(rng, features) + random_case(rng, name)
+        if value is not None:
+            text += random_equals(rng, features, 'space-around-attribute-equals') + value
+    if rng.random() < 0.15:
+        features.add('extension')
+        text += random_separator(rng, features) + rng.choice(extension_attributes)
+    return text, frozenset(features)
+
+def random_cookie_header(rng):
+    '''Returns a random Cookie header value and the set of its features.'''
+    
+    features = set()
+    text = ''
+    names = set()
+    for i in range(rng.randint(1, 6)):
+        name = random_name(rng)
+        if name in names:
+            continue
+        names.add(name)
+        if text:
+            text += random_separator(rng, features)
+        text += name + random_equals(rng, features, 'space-around-equals') + random_value(rng, features)
+    return text, frozenset(features)
+
+class Mismatch(object):
+    def __init__(self, text, parser, field, ocookie_result, stdlib_result, features=frozenset()):
+        self.text = text
+        self.parser = parser
+        self.field = field
+        self.ocookie_result = ocookie_result
+        self.stdlib_result = stdlib_result
+        self.features = features
+    
+    def __str__(self):
+        return '%s: %s: ocookie %r, %s %r' % (
+            self.text, self.field, self.ocookie_result, self.parser, self.stdlib_result)
+
+# Attributes SimpleCookie loses when it stops parsing early
+missing_attribute_fields = ('path missing', 'domain missing', 'expires missing',
+    'max-age missing', 'secure missing', 'httponly missing')
+
+# Known divergences between ocookie and the standard library, as
+# (input feature, parser, fields, description). A mismatch is expected
+# if its input has the feature and the mismatch was reported for the
+# parser and one of the fields.
+known_divergences = (
+    ('date-strftime_format', 'SimpleCookie', ('cookie', 'expires'),
+        'SimpleCookie rejects dates in the strftime_format layout, which '
+        'CookieExpirationTime produces, and drops the cookie (Python 3) or '
+        'keeps only the weekday (Python 2)'),
+    ('non-ascii', 'SimpleCookie', ('cookie', 'cookies', 'value') + missing_attribute_fields,
+        'SimpleCookie stops parsing at the first non-ASCII character'),
+    ('extension', 'ocookie', ('cookie',),
+        'the strict parser rejects attributes it does not know'),
+    ('extension', 'SimpleCookie', ('cookie',),
+        'SimpleCookie takes unknown attributes for further cookies'),
+    ('quoted-semicolon', 'ocookie', ('cookie',),
+        'ocookie splits Set-Cookie values on every ";", including quoted ones, '
+        'and rejects the rest of the quoted value as an attribute'),
+    ('quoted-semicolon', 'SimpleCookie', ('value', 'cookies'),
+        'SimpleCookie keeps ";" within quoted values, ocookie and http.cookiejar split on it'),
+    ('space-around-equals', 'SimpleCookie', ('name', 'value', 'cookies'),
+        'ocookie keeps whitespace around "=" in cookie names and values'),
+    ('space-around-equals', 'parse_ns_headers', ('name', 'value'),
+        'ocookie keeps whitespace around "=" in cookie names and values'),
+    ('space-before-semicolon', 'SimpleCookie', ('value',),
+        'ocookie keeps whitespace before ";" in Set-Cookie values'),
+    ('space-before-semicolon', 'parse_ns_headers', ('value',),
+        'ocookie keeps whitespace before ";" in Set-Cookie values'),
+)
+
+def known_divergence(mismatch):
+    '''Returns the description of the known divergence explaining
+    mismatch, or None if mismatch is unexpected.
+    '''
+    
+    for feature, parser, fields, description in known_divergences:
+        if feature in mismatch.features and parser == mismatch.parser and mismatch.field in fields:
+            return description
+    return None
+
+def is_known_divergence(mismatch):
+    return known_divergence(mismatch) is not None
+
+def attribute_field(key, stdlib_result):
+    '''Returns the field name for a mismatch of attribute key:
+    key, or key + ' missing' if the standard library did not set it.
+    '''
+    
+    if stdlib_result:
+        return key
+    return key + ' missing'
+
+def parse_http_time_or_none(text):
+    try:
+        return ocookie.parse_http_time(text)
+    except ValueError:
+        return None
+
+def compare_set_cookie(text, features=frozenset()):
+    mismatches = []
+    
+    def mismatch(parser, field, ocookie_result, stdlib_result):
+        mismatches.append(Mismatch(text, parser, field, ocookie_result, stdlib_result, features))
+    
+    try:
+        cookie = ocookie.CookieParser.parse_set_cookie_value(text)
+    except (ocookie.CookieError, ValueError) as e:
+        mismatch('ocookie', 'cookie', repr(e), None)
+        # compare what the lenient parser makes of text instead
+        cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+        if cookie is None:
+            return mismatches
+    
+    simple_cookie = stdlib_cookies.SimpleCookie()
+    try:
+        simple_cookie.load(native_text(text))
+    except stdlib_cookies.CookieError:
+        pass
+    morsels = list(simple_cookie.values())
+    if len(morsels) != 1:
+        mismatch('SimpleCookie', 'cookie', cookie.name, [morsel.key for morsel in morsels])
+    else:
+        morsel = morsels[0]
+        if morsel.key != cookie.name:
+            mismatch('SimpleCookie', 'name', cookie.name, morsel.key)
+        if morsel.coded_value != cookie.value:
+            mismatch('SimpleCookie', 'value', cookie.value, morsel.coded_value)
+        for key in ('path', 'domain', 'expires'):
+            if (morsel[key] or None) != cookie.attributes.get(key):
+                mismatch('SimpleCookie', attribute_field(key, morsel[key]),
+                    cookie.attributes.get(key), morsel[key])
+        max_age = morsel['max-age'] and float(morsel['max-age']) or None
+        if max_age != (cookie.attributes.get('max-age') or None):
+            mismatch('SimpleCookie', attribute_field('max-age', morsel['max-age']),
+                cookie.attributes.get('max-age'), morsel['max-age'])
+        for key in ('secure', 'httponly'):
+            if bool(morsel[key]) != bool(cookie.attributes.get(key)):
+                mismatch('SimpleCookie', attribute_field(key, morsel[key]),
+                    cookie.attributes.get(key), morsel[key])
+    
+    pairs = stdlib_cookiejar.parse_ns_headers([text])[0]
+    name, value = pairs[0]
+    if name != cookie.name:
+        mismatch('parse_ns_headers', 'name', cookie.name, name)
+    if value != cookie.value:
+        mismatch('parse_ns_headers', 'value', cookie.value, value)
+    ns_attributes = dict(pairs[1:])
+    ns_expires = ns_attributes.get('expires')
+    if 'expires' in cookie.attributes:
+        expires = parse_http_time_or_none(cookie.attributes['expires'])
+        if expires != ns_expires:
+            mismatch('parse_ns_headers', 'expires', expires, ns_expires)
+    for key in ('path', 'domain'):
+        if ns_attributes.get(key) != cookie.attributes.get(key):
+            mismatch('parse_ns_headers', key, cookie.attributes.get(key), ns_attributes.get(key))
+    ns_max_age = ns_attributes.get('max-age')
+    if ns_max_age is not None:
+        ns_max_age = float(ns_max_age)
+    if ns_max_age != cookie.attributes.get('max-age'):
+        mismatch('parse_ns_headers', 'max-age', cookie.attributes.get('max-age'), ns_max_age)
+    if ('secure' in ns_attributes) != bool(cookie.attributes.get('secure')):
+        mismatch('parse_ns_headers', 'secure', cookie.attributes.get('secure'), 'secure' in ns_attributes)
+    return mismatches
+
+def compare_cookie_header(text, features=frozenset()):
+    mismatches = []
+    ocookie_values = {}
+    try:
+        cookie_dict = ocookie.CookieParser.parse_cookie_value(text)
+    except ValueError as e:
+        mismatches.append(Mismatch(text, 'ocookie', 'cookie', repr(e), None, features))
+        return mismatches
+    for name in cookie_dict:
+        ocookie_values[name] = cookie_dict[name].value
+    
+    simple_cookie = stdlib_cookies.SimpleCookie()
+    simple_cookie.load(native_text(text))
+    stdlib_values = dict((morsel.key, morsel.coded_value) for morsel in simple_cookie.values())
+    if ocookie_values != stdlib_values:
+        mismatches.append(Mismatch(text, 'SimpleCookie', 'cookies', ocookie_values, stdlib_values, features))
+    return mismatches
+
+def generate_set_cookie_values(seed, count):
+    rng = random.Random(seed)
+    return [random_set_cookie(rng) for i in range(count)]
+
+def generate_cookie_headers(seed, count):
+    rng = random.Random(seed)
+    return [random_cookie_header(rng) for i in range(count)]
+
+def run_differential(count=cases_per_seed):
+    mismatches = []
+    for seed in seeds:
+        for text, features in generate_set_cookie_values(seed, count):
+            mismatches.extend(compare_set_cookie(text, features))
+        for text, features in generate_cookie_headers(seed, count):
+            mismatches.extend(compare_cookie_header(text, features))
+    return mismatches
+
+# Throughput is measured on all generated values; parsers that reject
+# some of them are timed including the cost of raising the error.
+
+def parse_set_cookie_value_strict(text):
+    try:
+        ocookie.CookieParser.parse_set_cookie_value(text)
+    except ocookie.CookieError:
+        pass
+
+def simple_cookie_load(text):
+    try:
+        stdlib_cookies.SimpleCookie().load(native_text(text))
+    except stdlib_cookies.CookieError:
+        pass
+
+def parse_ns_header(text):
+    stdlib_cookiejar.parse_ns_headers([text])
+
+def measure(function, texts, min_time=0.2):
+    '''Returns calls per second of function over texts.'''
+    
+    calls = 0
+    start = time.time()
+    while True:
+        for text in texts:
+            function(text)
+        calls += len(texts)
+        elapsed = time.time() - start
+        if elapsed >= min_time:
+            return calls / elapsed
+
+def run_throughput(count=cases_per_seed, min_time=0.2):
+    '''Returns a list of (header kind, parser, calls per second).'''
+    
+    set_cookie_values = [text for seed in seeds for text, features in generate_set_cookie_values(seed, count)]
+    cookie_headers = [text for seed in seeds for text, features in generate_cookie_headers(seed, count)]
+    parsers = [
+        ('Set-Cookie', 'ocookie strict', parse_set_cookie_value_strict, set_cookie_values),
+        ('Set-Cookie', 'ocookie lenient', ocookie.CookieParser.parse_set_cookie_value_lenient, set_cookie_values),
+        ('Set-Cookie', 'SimpleCookie', simple_cookie_load, set_cookie_values),
+        ('Set-Cookie', 'parse_ns_headers', parse_ns_header, set_cookie_values),
+        ('Cookie', 'ocookie', ocookie.CookieParser.parse_cookie_value, cookie_headers),
+        ('Cookie', 'SimpleCookie', simple_cookie_load, cookie_headers),
+    ]
+    return [(kind, name, measure(function, texts, min_time)) for kind, name, function, texts in parsers]
+
+class DifferentialTest(unittest.TestCase):
+    def test_generation_is_deterministic(self):
+        self.assertEqual(generate_set_cookie_values(1, 20), generate_set_cookie_values(1, 20))
+        self.assertEqual(generate_cookie_headers(1, 20), generate_cookie_headers(1, 20))
+    
+    def test_all_features_generated(self):
+        used = set()
+        for seed in seeds:
+            for text, features in generate_set_cookie_values(seed, cases_per_seed):
+                used.update(features)
+            for text, features in generate_cookie_headers(seed, cases_per_seed):
+                used.update(features)
+        expected = set(date_features.values())
+        expected.update(['equals-in-value', 'quoted', 'quoted-semicolon', 'quoted-space',
+            'comma', 'non-ascii', 'empty-value', 'space-around-equals',
+            'space-around-attribute-equals', 'space-before-semicolon', 'extension'])
+        self.assertEqual(expected, used)
+    
+    def test_no_unexpected_mismatches(self):
+        mismatches = run_differential()
+        unexpected = [str(mismatch) for mismatch in mismatches if not is_known_divergence(mismatch)]
+        self.assertEqual([], unexpected)
+        
+        # every known divergence must still occur, otherwise it is
+        # obsolete and would hide regressions
+        observed = set(known_divergence(mismatch) for mismatch in mismatches)
+        for feature, parser, fields, description in known_divergences:
+            self.assertTrue(description in observed, description)
+    
+    def test_mismatch_detection(self):
+        mismatches = compare_cookie_header('a = b; c=d')
+        self.assertEqual(1, len(mismatches))
+        self.assertEqual({'a ': ' b', 'c': 'd'}, mismatches[0].ocookie_result)
+        self.assertEqual({'a': 'b', 'c': 'd'}, mismatches[0].stdlib_result)
+        # known only when the input is generated with the feature
+        self.assertFalse(is_known_divergence(mismatches[0]))
+        mismatches = compare_cookie_header('a = b; c=d', frozenset(['space-around-equals']))
+        self.assertTrue(is_known_divergence(mismatches[0]))
+    
+    def test_attribute_mismatches(self):
+        # a wrong path is not explained by a feature that only makes
+        # SimpleCookie lose attributes
+        mismatch = Mismatch('a=b; path=/x', 'SimpleCookie', 'path', '/x', '/y', frozenset(['non-ascii']))
+        self.assertFalse(is_known_divergence(mismatch))
+        mismatch = Mismatch('a=b; path=/x', 'SimpleCookie', 'path missing', '/x', '', frozenset(['non-ascii']))
+        self.assertTrue(is_known_divergence(mismatch))
+        
+        self.assertEqual([], compare_set_cookie('a=b; Path=/x; Domain=.a.com; Max-Age=60; Secure'))
+    
+    def test_throughput_harness(self):
+        results = run_throughput(count=2, min_time=0)
+        self.assertEqual(6, len(results))
+        for kind, name, rate in results:
+            self.assertTrue(rate > 0)
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else cases_per_seed
+    mismatches = run_differential(count)
+    counts = {}
+    unexpected = []
+    for mismatch in mismatches:
+        description = known_divergence(mismatch)
+        if description is None:
+            unexpected.append(mismatch)
+        else:
+            counts[description] = counts.get(description, 0) + 1
+    print('%d mismatches, %d unexpected' % (len(mismatches), len(unexpected)))
+    for description in sorted(counts):
+        print('%6d  %s' % (counts[description], description))
+    for mismatch in unexpected:
+        print('  ' + str(mismatch))
+    print('')
+    print('%-12s %-18s %12s' % ('header', 'parser', 'ops/sec'))
+    for kind, name, rate in run_throughput(count):
+        print('%-12s %-18s %12.0f' % (kind, name, rate))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import unittest
+
+# Cumulative import time of the ocookie package with warm bytecode caches,
+# in microseconds, as reported by -X importtime. The package takes about
+# 500 us; importing a module like urllib.parse alone exceeds the limit.
+import_time_limit = 2000
+
+package_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def run_python(args, pycache_prefix=None):
+    env = dict(os.environ)
+    env['PYTHONPATH'] = package_root
+    if pycache_prefix is not None:
+        # write bytecode even if the environment disables it, so that
+        # timings do not include compiling
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        env['PYTHONPYCACHEPREFIX'] = pycache_prefix
+    process = subprocess.Popen([sys.executable] + args,
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE, env=env)
+    stdout, stderr = process.communicate()
+    if process.returncode != 0:
+        raise AssertionError('Python failed: %s' % stderr.decode('utf8', 'replace'))
+    return stdout.decode('utf8'), stderr.decode('utf8')
+
+class ImportTest(unittest.TestCase):
+    def test_imported_modules(self):
+        code = (
+            'import sys\n'
+            'before = set(sys.modules)\n'
+            'import ocookie\n'
+            'print(" ".join(sorted(set(sys.modules) - before)))\n'
+        )
+        stdout, stderr = run_python(['-c', code])
+        self.assertEqual(['ocookie'], stdout.split())
+    
+    def test_lazy_submodule(self):
+        code = (
+            'import sys, ocookie\n'
+            'assert "ocookie.httplib_adapter" not in sys.modules\n'
+            'print(ocookie.httplib_adapter.__name__)\n'
+        )
+        stdout, stderr = run_python(['-c', code])
+        self.assertEqual('ocookie.httplib_adapter', stdout.strip())
+    
+    def test_import_time(self):
+        if sys.version_info < (3, 8):
+            # -X importtime or PYTHONPYCACHEPREFIX is not available
+            return
+        
+        pycache_prefix = tempfile.mkdtemp()
+        try:
+            best = self._best_import_time(pycache_prefix)
+        finally:
+            shutil.rmtree(pycache_prefix)
+        self.assertTrue(best is not None)
+        self.assertTrue(best < import_time_limit,
+            'Importing ocookie took %d us, limit is %d us' % (best, import_time_limit))
+    
+    def _best_import_time(self, pycache_prefix):
+        # populate the bytecode cache
+        run_python(['-c', 'import ocookie'], pycache_prefix)
+        best = None
+        for attempt in range(3):
+            stdout, stderr = run_python(['-X', 'importtime', '-c', 'import ocookie'], pycache_prefix)
+            for line in stderr.splitlines():
+                fields = [field.strip() for field in line.split('|')]
+                if len(fields) == 3 and fields[2] == 'ocookie':
+                    cumulative = int(fields[1])
+                    if best is None or cumulative < best:
+                        best = cumulative
+        return best
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,6 +9,31 @@ class CookieTest(unittest.TestCase):
         self.assertEquals('bar', cookie.value)
         self.assertTrue(cookie.httponly)
         self.assertFalse(cookie.secure)
+    
+    def test_set_cookie_header_value(self):
+        cookie = ocookie.Cookie('foo', 'bar', path='/', max_age=3600, httponly=True, secure=False)
+        text = cookie.set_cookie_header_value()
+        self.assertTrue(text.startswith('foo=bar; '))
+        self.assertEqual(
+            ['HttpOnly', 'Max-Age=3600', 'Path=/'],
+            sorted(text.split('; ')[1:])
+        )
+        
+        parsed = ocookie.CookieParser.parse_set_cookie_value(text)
+        self.assertEqual('/', parsed.path)
+        self.assertEqual(3600, parsed.attributes['max-age'])
+    
+    def test_set_cookie_header_value_none(self):
+        cookie = ocookie.Cookie('foo', None, path='/')
+        self.assertEqual('foo=; Path=/', cookie.set_cookie_header_value())
+
+class AttributeTablesTest(unittest.TestCase):
+    def test_tables(self):
+        self.assertTrue(isinstance(ocookie.OPTIONAL_ATTRIBUTES, list))
+        self.assertEqual(['name', 'value'] + ocookie.OPTIONAL_ATTRIBUTES, ocookie.ALL_ATTRIBUTES)
+        self.assertEqual(True, ocookie.OPTIONAL_ATTRIBUTES_DICT['path'])
+        self.assertEqual(True, ocookie.ALL_ATTRIBUTES_DICT['name'])
+        self.assertFalse('name' in ocookie.OPTIONAL_ATTRIBUTES_DICT)
 
 class CookieDictTest(unittest.TestCase):
     def test_cookie_header_value_one(self):
@@ -148,6 +173,47 @@ class CookieJarTest(unittest.TestCase):
         expected = 'foo=a:b'
         self.assertEqual(expected, cookie_jar.build_cookie_header_value())
     
+    def test_build_cookie_header_value_fragment_update(self):
+        cookie_jar = ocookie.CookieJar()
+        cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        self.assertEqual('foo=bar', cookie_jar.build_cookie_header_value())
+        
+        cookie_jar['foo'].value = 'quux'
+        self.assertEqual('foo=quux', cookie_jar.build_cookie_header_value())
+        cookie_jar['foo'].value = ' '
+        self.assertEqual('', cookie_jar.build_cookie_header_value())
+    
+    def test_build_cookie_header_value_max_size(self):
+        cookie_jar = ocookie.CookieJar()
+        cookie_jar.add(ocookie.Cookie('root', 'a', path='/'))
+        cookie_jar.add(ocookie.Cookie('deep', 'b', path='/a/b'))
+        cookie_jar.add(ocookie.Cookie('nopath', 'c'))
+        cookie_jar['root'].issue_time = 1
+        
+        self.assertEqual('deep=b; root=a; nopath=c', cookie_jar.build_cookie_header_value(max_size=24))
+        self.assertEqual('deep=b; root=a', cookie_jar.build_cookie_header_value(max_size=23))
+        self.assertEqual('deep=b', cookie_jar.build_cookie_header_value(max_size=6))
+        self.assertEqual('', cookie_jar.build_cookie_header_value(max_size=5))
+    
+    def test_build_cookie_header_value_max_size_bytes(self):
+        cookie_jar = ocookie.CookieJar()
+        cookie_jar.add(ocookie.Cookie('deep', u'\xe9', path='/a/b'))
+        cookie_jar.add(ocookie.Cookie('root', 'a', path='/'))
+        
+        # deep=\xe9 is 6 characters but 7 bytes
+        self.assertEqual(u'deep=\xe9; root=a', cookie_jar.build_cookie_header_value(max_size=15))
+        self.assertEqual(u'deep=\xe9', cookie_jar.build_cookie_header_value(max_size=14))
+        self.assertEqual(u'deep=\xe9', cookie_jar.build_cookie_header_value(max_size=7))
+        self.assertEqual('', cookie_jar.build_cookie_header_value(max_size=6))
+    
+    def test_expiration_change(self):
+        cookie_jar = ocookie.CookieJar()
+        cookie_jar.add(ocookie.Cookie('foo', 'bar', max_age=3600))
+        self.assertEqual('foo=bar', cookie_jar.build_cookie_header_value())
+        
+        cookie_jar['foo'].issue_time -= 7200
+        self.assertEqual('', cookie_jar.build_cookie_header_value())
+    
     def test_construct_copy(self):
         cookie_jar = ocookie.CookieJar()
         cookie_jar.add(ocookie.Cookie('foo', 'a:b'))
@@ -180,6 +246,18 @@ class CookieHeaderValueParsingTest(unittest.TestCase):
         # negative checks for sanity
         self.assert_('bar' not in cookie_dict)
     
+    def test_equal_sign_in_value(self):
+        value = 'a=b=c; d=e;'
+        cookie_dict = ocookie.CookieParser.parse_cookie_value(value)
+        self.assertEqual(2, len(cookie_dict))
+        self.assertEqual('b=c', cookie_dict['a'].value)
+        self.assertEqual('e', cookie_dict['d'].value)
+    
+    def test_bare_token(self):
+        value = 'a=b; flag; c=d'
+        cookie_dict = ocookie.CookieParser.parse_cookie_value(value)
+        self.assertEqual(['a', 'c'], sorted(cookie_dict))
+    
     def test_empty_attribute_at_end(self):
         value = 'wayback_server=27; Domain=archive.org; Path=/; Expires=Fri, 09-Jan-15 06:44:37 GMT;'
         cookie = ocookie.CookieParser.parse_set_cookie_value(value)
@@ -215,6 +293,87 @@ class CookieParserTest(unittest.TestCase):
         cookie = ocookie.CookieParser.parse_set_cookie_value(text)
         self.assertEquals('PREF', cookie.name)
         self.assertEquals('ID=38a82ea:FF=0:TM=59433:LM=209211:S=ad_B-z5', cookie.value)
+    
+    def test_parsing_with_equal_sign_in_attribute(self):
+        text = 'foo=bar; path=/a=b'
+        cookie = ocookie.CookieParser.parse_set_cookie_value(text)
+        self.assertEquals('/a=b', cookie.path)
+
+class LenientCookieParserTest(unittest.TestCase):
+    def test_parsing(self):
+        text = 'foo=bar; domain=.cc.edu; Max-Age=60; httponly'
+        cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+        self.assertEqual([], warnings)
+        self.assertEqual('foo', cookie.name)
+        self.assertEqual('bar', cookie.value)
+        self.assertEqual('.cc.edu', cookie.domain)
+        self.assertEqual(60, cookie.attributes['max-age'])
+        self.assertEqual(True, cookie.httponly)
+        self.assertEqual(None, cookie.extensions)
+        
+        strict = ocookie.CookieParser.parse_set_cookie_value(text)
+        self.assertEqual(strict.attributes, cookie.attributes)
+    
+    def test_unknown_attributes(self):
+        text = 'foo=bar; SameSite=Lax; Partitioned; path=/'
+        cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+        self.assertEqual('/', cookie.path)
+        self.assertEqual({'samesite': 'Lax', 'partitioned': True}, cookie.extensions)
+        self.assertEqual([
+            (ocookie.PARSE_UNKNOWN_ATTRIBUTE, 'samesite'),
+            (ocookie.PARSE_UNKNOWN_ATTRIBUTE, 'partitioned'),
+        ], warnings)
+        text = cookie.set_cookie_header_value()
+        self.assertTrue(text.startswith('foo=bar; '))
+        self.assertEqual(
+            ['Path=/', 'partitioned', 'samesite=Lax'],
+            sorted(text.split('; ')[1:])
+        )
+    
+    def test_invalid_attributes(self):
+        text = 'foo=bar; max-age=soon; =x; max-age;'
+        cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+        self.assertEqual('bar', cookie.value)
+        self.assertFalse('max-age' in cookie.attributes)
+        self.assertEqual(
+            [ocookie.PARSE_INVALID_ATTRIBUTE] * 3,
+            [code for code, detail in warnings]
+        )
+    
+    def test_invalid_expires(self):
+        for expires in ['garbage', 'Wed, 11 Feb 2037 22:59:51 +0000']:
+            text = 'foo=bar; path=/; expires=' + expires
+            cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+            self.assertFalse('expires' in cookie.attributes)
+            self.assertEqual([(ocookie.PARSE_INVALID_ATTRIBUTE, ' expires=' + expires)], warnings)
+            
+            cookie_jar = ocookie.CookieJar()
+            cookie_jar.add(cookie)
+            self.assertTrue('foo' in cookie_jar)
+    
+    def test_expires_cache(self):
+        ocookie._valid_expires_cache.clear()
+        for i in range(ocookie.VALID_EXPIRES_CACHE_SIZE + 10):
+            text = 'foo=bar; expires=Wed, 11 Feb 2037 %02d:%02d:00 GMT' % (i // 60, i % 60)
+            if i % 2:
+                text += 'x'
+            cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+            self.assertEqual(not (i % 2), 'expires' in cookie.attributes)
+            self.assertTrue(len(ocookie._valid_expires_cache) <= ocookie.VALID_EXPIRES_CACHE_SIZE)
+        self.assertEqual(10, len(ocookie._valid_expires_cache))
+    
+    def test_missing_name(self):
+        for text in ['foo', '=bar; path=/', '']:
+            cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient(text)
+            self.assertEqual(None, cookie)
+            self.assertEqual([(ocookie.PARSE_MISSING_NAME, text)], warnings)
+    
+    def test_jar(self):
+        cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient('foo=bar; SameSite=Strict')
+        cookie_jar = ocookie.CookieJar()
+        cookie_jar.add(cookie)
+        self.assertEqual('foo=bar', cookie_jar.build_cookie_header_value())
+        self.assertEqual({'samesite': 'Strict'}, cookie_jar['foo'].extensions)
 
 class TimeParsingTest(unittest.TestCase):
     def test_time_parsing(self):
@@ -236,6 +395,41 @@ class TimeParsingTest(unittest.TestCase):
         text = 'Fri, 09-Jan-15 06:44:37 GMT'
         time = ocookie.parse_http_time(text)
         self.assertEquals(1420785877, time)
+    
+    def test_fast_path_matches_strptime(self):
+        import calendar
+        
+        def parse_with_strptime(text):
+            for format in (ocookie.strftime_format2, ocookie.strftime_format_netscape,
+                ocookie.strftime_format_netscape_short_year
+            ):
+                try:
+                    return calendar.timegm(time.strptime(text, format))
+                except ValueError:
+                    pass
+            return None
+        
+        texts = []
+        for timestamp in range(0, 2 ** 31, 7654321):
+            for format in (ocookie.strftime_format2, ocookie.strftime_format_netscape,
+                ocookie.strftime_format_netscape_short_year
+            ):
+                texts.append(time.strftime(format.replace('%Z', 'GMT'), time.gmtime(timestamp)))
+        texts += [
+            'Mon, 29 Feb 2016 00:00:00 GMT', 'Tue, 29 Feb 2100 00:00:00 GMT',
+            'Sat, 31 Apr 2037 00:00:00 GMT', 'Sat, 00 Apr 2037 00:00:00 GMT',
+            'Sat, 11 Apr 2037 24:00:00 GMT', 'Sat, 11 Apr 2037 23:59:61 GMT',
+            'Sat, 11-Apr 2037 23:59:59 GMT', 'Sat, 11 Apr 37 23:59:59 GMT',
+            'Sat, 11-Apr-69 23:59:59 GMT', 'Sat, 11-Apr-68 23:59:59 GMT',
+            'sat, 11 apr 2037 23:59:59 GMT', 'Sat, 11 Apr 2037 23:59:59 UTC',
+            'Sat, 11 Apr 2037 23:59:59 +0000', 'Sat, 1 Apr 2037 23:59:59 GMT',
+        ]
+        for text in texts:
+            expected = parse_with_strptime(text)
+            if expected is None:
+                self.assertRaises(ValueError, ocookie.parse_http_time, text)
+            else:
+                self.assertEqual(expected, ocookie.parse_http_time(text), text)
 
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import ocookie
+import ocookie.publicsuffix
+import ocookie.tracing
+
+rules = u'''// comment
+com
+uk
+co.uk
+jp
+ac.jp
+*.kobe.jp
+!city.kobe.jp
+*.ck
+!www.ck
+// punycode for the IDN rule below is xn--55qx5d.cn
+公司.cn
+'''
+
+class PublicSuffixListTest(unittest.TestCase):
+    def setUp(self):
+        self.psl = ocookie.publicsuffix.PublicSuffixList.parse(rules)
+    
+    def test_public_suffix(self):
+        psl = self.psl
+        self.assertEqual('com', psl.public_suffix('example.com'))
+        self.assertEqual('co.uk', psl.public_suffix('www.example.co.uk'))
+        self.assertEqual('c.kobe.jp', psl.public_suffix('b.c.kobe.jp'))
+        self.assertEqual('kobe.jp', psl.public_suffix('www.city.kobe.jp'))
+        self.assertEqual('ck', psl.public_suffix('www.ck'))
+        self.assertEqual('b.ck', psl.public_suffix('a.b.ck'))
+        self.assertEqual('xn--55qx5d.cn', psl.public_suffix('shop.xn--55qx5d.cn'))
+        # implicit wildcard rule
+        self.assertEqual('example', psl.public_suffix('www.example'))
+    
+    def test_is_public_suffix(self):
+        psl = self.psl
+        self.assertTrue(psl.is_public_suffix('.co.uk'))
+        self.assertTrue(psl.is_public_suffix('CO.UK'))
+        self.assertTrue(psl.is_public_suffix('foo.kobe.jp'))
+        self.assertFalse(psl.is_public_suffix('city.kobe.jp'))
+        self.assertFalse(psl.is_public_suffix('example.co.uk'))
+        self.assertFalse(psl.is_public_suffix(''))
+    
+    def test_overlapping_rules(self):
+        psl = ocookie.publicsuffix.PublicSuffixList.parse(u'com\n*.foo.com\na.b.foo.com\n')
+        self.assertEqual('b.foo.com', psl.public_suffix('x.b.foo.com'))
+        self.assertEqual('a.b.foo.com', psl.public_suffix('x.a.b.foo.com'))
+        self.assertTrue(psl.is_public_suffix('b.foo.com'))
+        self.assertTrue(psl.is_public_suffix('c.foo.com'))
+        self.assertFalse(psl.is_public_suffix('foo.com'))
+        
+        cookie_jar = ocookie.CookieJar(public_suffix_list=psl)
+        cookie_jar.add(ocookie.Cookie('super', 'cookie', domain='.b.foo.com'))
+        self.assertFalse('super' in cookie_jar)
+    
+    def test_registrable_domain(self):
+        psl = self.psl
+        self.assertEqual('example.co.uk', psl.registrable_domain('a.b.example.co.uk'))
+        self.assertEqual('city.kobe.jp', psl.registrable_domain('www.city.kobe.jp'))
+        self.assertEqual(None, psl.registrable_domain('co.uk'))
+    
+    def test_cache(self):
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'list.dat')
+            cache_path = os.path.join(directory, 'list.cache')
+            with open(path, 'wb') as f:
+                f.write(rules.encode('utf8'))
+            
+            psl = ocookie.publicsuffix.PublicSuffixList.load(path, cache_path=cache_path)
+            self.assertTrue(os.path.exists(cache_path))
+            cached = ocookie.publicsuffix.PublicSuffixList.load(path, cache_path=cache_path)
+            self.assertEqual(psl.trie, cached.trie)
+            
+            # a changed list invalidates the cache
+            with open(path, 'ab') as f:
+                f.write(b'example.com\n')
+            changed = ocookie.publicsuffix.PublicSuffixList.load(path, cache_path=cache_path)
+            self.assertTrue(changed.is_public_suffix('example.com'))
+            
+            # so does an edit of the same size within the same second
+            if not hasattr(os.stat(path), 'st_mtime_ns'):
+                # os.utime cannot set nanoseconds before 3.3
+                return
+            mtime_ns = os.stat(path).st_mtime_ns
+            with open(path, 'wb') as f:
+                f.write(rules.encode('utf8') + b'example.org\n')
+            second = mtime_ns - mtime_ns % 1000000000
+            os.utime(path, ns=(second + 1, second + 1))
+            ocookie.publicsuffix.PublicSuffixList.load(path, cache_path=cache_path)
+            os.utime(path, ns=(second + 2, second + 2))
+            with open(path, 'wb') as f:
+                f.write(rules.encode('utf8') + b'example.net\n')
+            os.utime(path, ns=(second + 2, second + 2))
+            changed = ocookie.publicsuffix.PublicSuffixList.load(path, cache_path=cache_path)
+            self.assertTrue(changed.is_public_suffix('example.net'))
+        finally:
+            shutil.rmtree(directory)
+
+class CookieJarPublicSuffixTest(unittest.TestCase):
+    def setUp(self):
+        psl = ocookie.publicsuffix.PublicSuffixList.parse(rules)
+        self.cookie_jar = ocookie.CookieJar(public_suffix_list=psl)
+    
+    def test_reject(self):
+        self.cookie_jar.add(ocookie.Cookie('super', 'cookie', domain='.co.uk'))
+        self.assertFalse('super' in self.cookie_jar)
+    
+    def test_accept(self):
+        self.cookie_jar.add(ocookie.Cookie('normal', 'cookie', domain='.example.co.uk'))
+        self.assertTrue('normal' in self.cookie_jar)
+        self.assertEqual('.example.co.uk', self.cookie_jar['normal'].domain)
+    
+    def test_downscope(self):
+        self.cookie_jar.add(ocookie.Cookie('host', 'cookie', domain='foo.kobe.jp'), request_host='foo.kobe.jp')
+        self.assertTrue('host' in self.cookie_jar)
+        self.assertEqual(None, self.cookie_jar['host'].domain)
+    
+    def test_downscope_does_not_change_cookie(self):
+        cookie = ocookie.LiveCookie('host', 'cookie', domain='foo.kobe.jp')
+        self.cookie_jar.add(cookie, request_host='foo.kobe.jp')
+        self.assertEqual('foo.kobe.jp', cookie.domain)
+        self.assertEqual(None, self.cookie_jar['host'].domain)
+    
+    def test_reject_is_traced(self):
+        try:
+            tracer = ocookie.tracing.enable()
+        except RuntimeError:
+            self.skipTest('time.perf_counter_ns is not available')
+        try:
+            self.cookie_jar.add(ocookie.LiveCookie('super', 'cookie', domain='.co.uk'))
+        finally:
+            ocookie.tracing.disable()
+        self.assertEqual(['insert'], [record[0] for record in tracer.records()])
+    
+    def test_copy(self):
+        copy = ocookie.CookieJar(self.cookie_jar)
+        copy.add(ocookie.Cookie('super', 'cookie', domain='.co.uk'))
+        self.assertFalse('super' in copy)
+
+if __name__ == '__main__':
+    unittest.main()
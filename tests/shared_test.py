@@ -0,0 +1,173 @@
+import multiprocessing
+import unittest
+
+import ocookie
+import ocookie.shared
+
+def add_cookie(jar, name, value):
+    jar.add(ocookie.Cookie(name, value, path='/'))
+    jar.close()
+
+class SharedCookieJarTest(unittest.TestCase):
+    def setUp(self):
+        if ocookie.shared.shared_memory is None:
+            self.skipTest('multiprocessing.shared_memory is not available')
+        self.cookie_jar = ocookie.shared.SharedCookieJar(capacity=8, slot_size=128)
+    
+    def tearDown(self):
+        self.cookie_jar.close()
+        self.cookie_jar.unlink()
+    
+    def test_add(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar', path='/', max_age=3600, httponly=True))
+        self.assertTrue('foo' in self.cookie_jar)
+        self.assertFalse('bar' in self.cookie_jar)
+        
+        cookie = self.cookie_jar['foo']
+        self.assertEqual('bar', cookie.value)
+        self.assertEqual('/', cookie.path)
+        self.assertEqual(True, cookie.httponly)
+        self.assertEqual(3600, cookie.attributes['max-age'])
+        self.assertTrue(cookie.valid())
+    
+    def test_extensions(self):
+        cookie, warnings = ocookie.CookieParser.parse_set_cookie_value_lenient('foo=bar; path=/; SameSite=Lax; Partitioned')
+        self.cookie_jar.add(cookie)
+        cookie = self.cookie_jar['foo']
+        self.assertEqual('/', cookie.path)
+        self.assertEqual({'samesite': 'Lax', 'partitioned': True}, cookie.extensions)
+        self.assertEqual('foo=bar', self.cookie_jar.build_cookie_header_value())
+    
+    def test_replacement(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        self.cookie_jar.add(ocookie.Cookie('foo', 'quux'))
+        self.assertEqual('quux', self.cookie_jar['foo'].value)
+        self.assertEqual(['foo'], list(self.cookie_jar))
+    
+    def test_expired_cookie_deletes(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar', expires='Sun, 01 Jan 2012 00:00:00 GMT'))
+        self.assertFalse('foo' in self.cookie_jar)
+    
+    def test_delete_and_reuse(self):
+        for i in range(8):
+            self.cookie_jar.add(ocookie.Cookie('c%d' % i, 'v'))
+        self.assertRaises(ocookie.CookieError, self.cookie_jar.add, ocookie.Cookie('extra', 'v'))
+        
+        del self.cookie_jar['c3']
+        self.assertFalse('c3' in self.cookie_jar)
+        self.cookie_jar.add(ocookie.Cookie('extra', 'v'))
+        self.assertTrue('extra' in self.cookie_jar)
+        for i in range(8):
+            if i != 3:
+                self.assertTrue('c%d' % i in self.cookie_jar)
+    
+    def test_churn(self):
+        cookie_jar = ocookie.shared.SharedCookieJar(capacity=64, slot_size=128)
+        try:
+            for i in range(2000):
+                cookie_jar.add(ocookie.Cookie('c%d' % i, 'v'))
+                if i >= 16:
+                    del cookie_jar['c%d' % (i - 16)]
+            self.assertEqual(16, len(cookie_jar.keys()))
+            
+            probes = []
+            read_header = cookie_jar._read_header
+            def counting_read_header(offset):
+                header, data = read_header(offset)
+                probes.append(header[1])
+                return header, data
+            cookie_jar._read_header = counting_read_header
+            for i in range(100):
+                del probes[:]
+                self.assertFalse('missing%d' % i in cookie_jar)
+                # the lookup stops at an empty slot
+                self.assertEqual(ocookie.shared.EMPTY, probes[-1])
+                self.assertTrue(len(probes) <= 17)
+        finally:
+            cookie_jar.close()
+            cookie_jar.unlink()
+    
+    def test_too_large(self):
+        self.assertRaises(ocookie.CookieError, self.cookie_jar.add, ocookie.Cookie('foo', 'x' * 200))
+    
+    def test_build_cookie_header_value(self):
+        self.cookie_jar.add(ocookie.Cookie('root', 'a', path='/'))
+        self.cookie_jar.add(ocookie.Cookie('deep', 'b', path='/a/b'))
+        self.cookie_jar.add(ocookie.Cookie('empty', ''))
+        self.assertEqual(['deep=b', 'root=a'], sorted(self.cookie_jar.build_cookie_header_value().split('; ')))
+        self.assertEqual('deep=b', self.cookie_jar.build_cookie_header_value(max_size=10))
+    
+    def test_build_cookie_header_value_max_size_bytes(self):
+        self.cookie_jar.add(ocookie.Cookie('deep', u'\xe9', path='/a/b'))
+        self.cookie_jar.add(ocookie.Cookie('root', 'a', path='/'))
+        self.assertEqual(u'deep=\xe9', self.cookie_jar.build_cookie_header_value(max_size=14))
+        self.assertEqual('', self.cookie_jar.build_cookie_header_value(max_size=6))
+    
+    def test_clear(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        self.cookie_jar.clear()
+        self.assertFalse('foo' in self.cookie_jar)
+        self.assertEqual('', self.cookie_jar.build_cookie_header_value())
+    
+    def test_cookie_dict(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        self.assertEqual('foo=bar', self.cookie_jar.cookie_dict.cookie_header_value())
+    
+    def test_other_process(self):
+        self.assertEqual('', self.cookie_jar.build_cookie_header_value())
+        process = multiprocessing.Process(target=add_cookie, args=(self.cookie_jar, 'foo', 'bar'))
+        process.start()
+        process.join()
+        self.assertEqual(0, process.exitcode)
+        self.assertEqual('bar', self.cookie_jar['foo'].value)
+        self.assertEqual('foo=bar', self.cookie_jar.build_cookie_header_value())
+
+class SharedCookieJarFailureTest(unittest.TestCase):
+    def setUp(self):
+        if ocookie.shared.shared_memory is None:
+            self.skipTest('multiprocessing.shared_memory is not available')
+        self.cookie_jar = ocookie.shared.SharedCookieJar(capacity=8, slot_size=128, timeout=0.05)
+    
+    def tearDown(self):
+        self.cookie_jar.close()
+        self.cookie_jar.unlink()
+    
+    def test_locked_reads(self):
+        cookie_jar = ocookie.shared.SharedCookieJar.attach(self.cookie_jar.name, self.cookie_jar.lock,
+            lock_free_reads=False)
+        try:
+            cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+            self.assertTrue('foo' in cookie_jar)
+            self.assertEqual(['foo'], cookie_jar.keys())
+            self.assertEqual('foo=bar', cookie_jar.build_cookie_header_value())
+        finally:
+            cookie_jar.close()
+    
+    def test_lock_timeout(self):
+        self.cookie_jar.lock.acquire()
+        try:
+            self.assertRaises(ocookie.CookieError, self.cookie_jar.add, ocookie.Cookie('foo', 'bar'))
+        finally:
+            self.cookie_jar.lock.release()
+    
+    def test_stale_write_in_progress(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        # simulate a writer that died after marking every record as
+        # being changed
+        buf = self.cookie_jar.shm.buf
+        for index in range(self.cookie_jar.capacity):
+            offset = self.cookie_jar._offset(index)
+            ocookie.shared.SEQUENCE.pack_into(buf, offset, 1)
+        self.assertRaises(ocookie.CookieError, self.cookie_jar.__contains__, 'foo')
+        self.assertRaises(ocookie.CookieError, self.cookie_jar.keys)
+    
+    def test_stale_rebuild_in_progress(self):
+        self.cookie_jar.add(ocookie.Cookie('foo', 'bar'))
+        buf = self.cookie_jar.shm.buf
+        ocookie.shared.SEQUENCE.pack_into(buf, ocookie.shared.REBUILD_OFFSET, 1)
+        self.assertRaises(ocookie.CookieError, self.cookie_jar.__contains__, 'missing')
+        self.assertRaises(ocookie.CookieError, self.cookie_jar.keys)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,126 @@
+import unittest
+
+import ocookie
+import ocookie.stream
+
+response = (
+    b'HTTP/1.1 200 OK\r\n'
+    b'Content-Type: text/html\r\n'
+    b'Set-Cookie: a=b; path=/\r\n'
+    b'X-Folded: one\r\n'
+    b'  two\r\n'
+    b'set-cookie2: c=d;\r\n'
+    b'\tdomain=.example.com\r\n'
+    b'\r\n'
+    b'body'
+)
+
+class SetCookieStreamParserTest(unittest.TestCase):
+    def test_whole(self):
+        parser = ocookie.stream.SetCookieStreamParser()
+        cookies = parser.feed(response)
+        self.assertTrue(parser.done)
+        self.assertEqual('HTTP/1.1 200 OK', parser.status_line)
+        self.assertEqual(b'body', parser.remainder)
+        self.assertEqual(['a', 'c'], [cookie.name for cookie in cookies])
+        self.assertEqual('/', cookies[0].path)
+        self.assertEqual('.example.com', cookies[1].domain)
+    
+    def test_byte_at_a_time(self):
+        emitted = []
+        parser = ocookie.stream.SetCookieStreamParser(callback=emitted.append)
+        for i in range(len(response)):
+            parser.feed(response[i:i + 1])
+            if parser.done:
+                break
+        self.assertEqual(['a', 'c'], [cookie.name for cookie in emitted])
+        self.assertEqual(b'', parser.remainder)
+    
+    def test_emits_before_end_of_headers(self):
+        parser = ocookie.stream.SetCookieStreamParser()
+        cookies = parser.feed(b'HTTP/1.1 200 OK\r\nSet-Cookie: a=b\r\n')
+        # the next line may be a continuation
+        self.assertEqual([], cookies)
+        cookies = parser.feed(b'X')
+        self.assertEqual(['a'], [cookie.name for cookie in cookies])
+        self.assertFalse(parser.done)
+    
+    def test_without_status_line(self):
+        parser = ocookie.stream.SetCookieStreamParser()
+        cookies = parser.feed(b'Set-Cookie: a=b\n\n')
+        self.assertEqual(['a'], [cookie.name for cookie in cookies])
+        self.assertTrue(parser.done)
+    
+    def test_cookie_jar(self):
+        cookie_jar = ocookie.CookieJar()
+        parser = ocookie.stream.SetCookieStreamParser(cookie_jar=cookie_jar)
+        parser.feed(response)
+        self.assertTrue('a' in cookie_jar)
+        self.assertTrue('c' in cookie_jar)
+    
+    def test_invalid_cookie(self):
+        cookie_jar = ocookie.CookieJar()
+        parser = ocookie.stream.SetCookieStreamParser(cookie_jar=cookie_jar)
+        cookies = parser.feed(
+            b'HTTP/1.1 200 OK\r\n'
+            b'Set-Cookie: a=b\r\n'
+            b'Set-Cookie: c=d; SameSite=Lax\r\n'
+            b'Set-Cookie: e=f\r\n'
+        )
+        self.assertEqual(['a'], [cookie.name for cookie in cookies])
+        self.assertEqual(1, len(parser.errors))
+        self.assertEqual('c=d; SameSite=Lax', parser.errors[0][0])
+        self.assertTrue(isinstance(parser.errors[0][1], ocookie.CookieError))
+        
+        header_size = parser.header_size
+        cookies = parser.feed(b'\r\nbody')
+        self.assertEqual(['e'], [cookie.name for cookie in cookies])
+        self.assertEqual(header_size + 2, parser.header_size)
+        self.assertEqual(1, len(parser.errors))
+        self.assertTrue(parser.done)
+        self.assertEqual(b'body', parser.remainder)
+        self.assertEqual(['a', 'e'], sorted(cookie_jar.keys()))
+    
+    def test_invalid_expires(self):
+        cookie_jar = ocookie.CookieJar()
+        parser = ocookie.stream.SetCookieStreamParser(cookie_jar=cookie_jar)
+        cookies = parser.feed(b'Set-Cookie: a=b; expires=garbage\r\nSet-Cookie: c=d\r\n\r\n')
+        self.assertEqual(['c'], [cookie.name for cookie in cookies])
+        self.assertEqual('a=b; expires=garbage', parser.errors[0][0])
+        self.assertEqual(['c'], list(cookie_jar.keys()))
+    
+    def test_line_size_limit(self):
+        parser = ocookie.stream.SetCookieStreamParser(max_line_size=32)
+        parser.feed(b'HTTP/1.1 200 OK\r\n')
+        self.assertRaises(ocookie.CookieError, parser.feed, b'Set-Cookie: ' + b'a' * 40)
+    
+    def test_size_limit_keeps_completed_cookies(self):
+        cookie_jar = ocookie.CookieJar()
+        parser = ocookie.stream.SetCookieStreamParser(cookie_jar=cookie_jar, max_line_size=40)
+        self.assertRaises(ocookie.CookieError, parser.feed,
+            b'Set-Cookie: a=b\r\nX: ' + b'y' * 60 + b'\r\n')
+        self.assertEqual(['a'], list(cookie_jar.keys()))
+        
+        cookie_jar = ocookie.CookieJar()
+        parser = ocookie.stream.SetCookieStreamParser(cookie_jar=cookie_jar, max_header_size=40)
+        self.assertRaises(ocookie.CookieError, parser.feed,
+            b'Set-Cookie: a=b\r\nSet-Cookie: c=d\r\nX: ' + b'y' * 20)
+        self.assertEqual(['a', 'c'], sorted(cookie_jar.keys()))
+    
+    def test_header_size_limit(self):
+        parser = ocookie.stream.SetCookieStreamParser(max_header_size=64)
+        parser.feed(b'HTTP/1.1 200 OK\r\n')
+        parser.feed(b'X-Padding: aaaaaaaaaaaaaaaaaaaa\r\n')
+        self.assertRaises(ocookie.CookieError, parser.feed, b'X-Padding: aaaaaaaaaaaaaaaaaaaa\r\n')
+    
+    def test_feed_after_done(self):
+        parser = ocookie.stream.SetCookieStreamParser()
+        parser.feed(b'HTTP/1.1 200 OK\r\n\r\n')
+        self.assertRaises(ocookie.CookieError, parser.feed, b'more')
+        
+        parser.reset()
+        cookies = parser.feed(response)
+        self.assertEqual(2, len(cookies))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import json
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+
+import ocookie
+import ocookie.cherrypywebtest
+import ocookie.tracing
+
+class TracingTest(unittest.TestCase):
+    def setUp(self):
+        try:
+            self.tracer = ocookie.tracing.enable(capacity=8)
+        except RuntimeError:
+            self.skipTest('time.perf_counter_ns is not available')
+    
+    def tearDown(self):
+        ocookie.tracing.disable()
+    
+    def test_phases(self):
+        cookie_jar = ocookie.cherrypywebtest.CpwtCookieJar()
+        cookie_jar.update([('Set-Cookie', 'a=b; expires=Wed, 11-Feb-2037 22:59:51 GMT')])
+        self.assertTrue('a' in cookie_jar)
+        
+        phases = [record[0] for record in self.tracer.records()]
+        self.assertEqual(['extract', 'tokenize', 'construct', 'construct', 'date', 'insert'], phases)
+        for phase, start, duration, thread in self.tracer.records():
+            self.assertTrue(duration >= 0)
+    
+    def test_ring_buffer(self):
+        for i in range(5):
+            ocookie.CookieParser.parse_set_cookie_value('a%d=b' % i)
+        self.assertEqual(10, self.tracer.count)
+        records = self.tracer.records()
+        self.assertEqual(8, len(records))
+        starts = [record[1] for record in records]
+        self.assertEqual(sorted(starts), starts)
+        
+        summary = self.tracer.summary()
+        self.assertEqual(4, summary['tokenize']['count'])
+        self.assertEqual(4, summary['construct']['count'])
+        stats = summary['construct']
+        self.assertTrue(stats['p50_ns'] <= stats['p90_ns'] <= stats['p99_ns'] <= stats['max_ns'])
+    
+    def test_disabled(self):
+        ocookie.tracing.disable()
+        ocookie.CookieParser.parse_set_cookie_value('a=b')
+        self.assertEqual(0, self.tracer.count)
+    
+    def test_export_chrome_trace(self):
+        ocookie.CookieParser.parse_set_cookie_value_lenient('a=b; SameSite=Lax')
+        directory = tempfile.mkdtemp()
+        try:
+            path = os.path.join(directory, 'trace.json')
+            self.tracer.export_chrome_trace(path)
+            with open(path) as f:
+                trace = json.load(f)
+        finally:
+            shutil.rmtree(directory)
+        events = trace['traceEvents']
+        self.assertEqual(['tokenize', 'construct'], [event['name'] for event in events])
+        self.assertEqual('X', events[0]['ph'])
+        self.assertTrue(events[0]['ts'] <= events[1]['ts'])
+
+    def test_threads(self):
+        tracer = ocookie.tracing.enable(capacity=1024)
+        
+        def parse():
+            for i in range(100):
+                ocookie.CookieParser.parse_set_cookie_value('a=b')
+        
+        threads = [threading.Thread(target=parse) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(800, tracer.count)
+        records = tracer.records()
+        self.assertEqual(800, len(records))
+        self.assertFalse(None in [record[0] for record in records])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,83 @@
+import unittest
+import wsgiref.util
+import wsgiref.validate
+
+import ocookie
+import ocookie.wsgi
+
+def touching_app(environ, start_response):
+    cookies = ocookie.wsgi.request_cookies(environ)
+    # second access must hit the cached dictionary
+    assert ocookie.wsgi.request_cookies(environ) is cookies
+    body = ','.join(sorted(name + ':' + cookies[name].value for name in cookies))
+    environ['ocookie'].set_cookie(ocookie.Cookie('visited', 'yes', path='/', httponly=True))
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [body.encode('utf8')]
+
+def ignoring_app(environ, start_response):
+    start_response('200 OK', [('Content-Type', 'text/plain')])
+    return [b'none']
+
+class WsgiMiddlewareTest(unittest.TestCase):
+    def setUp(self):
+        self.parse_count = 0
+        self.original_parse_cookie_value = ocookie.CookieParser.parse_cookie_value
+        
+        def counting_parse_cookie_value(text):
+            self.parse_count += 1
+            return self.original_parse_cookie_value(text)
+        
+        ocookie.CookieParser.parse_cookie_value = staticmethod(counting_parse_cookie_value)
+    
+    def tearDown(self):
+        ocookie.CookieParser.parse_cookie_value = staticmethod(self.original_parse_cookie_value)
+    
+    def _call(self, app, cookie_header=None):
+        environ = {}
+        wsgiref.util.setup_testing_defaults(environ)
+        if cookie_header is not None:
+            environ['HTTP_COOKIE'] = cookie_header
+        app = wsgiref.validate.validator(ocookie.wsgi.CookieMiddleware(app))
+        captured = {}
+        
+        def start_response(status, headers, exc_info=None):
+            captured['status'] = status
+            captured['headers'] = headers
+        
+        result = app(environ, start_response)
+        body = b''.join(result)
+        result.close()
+        return captured['headers'], body
+    
+    def test_request_cookies(self):
+        headers, body = self._call(touching_app, 'a=b; c=d=e')
+        self.assertEqual(b'a:b,c:d=e', body)
+        self.assertEqual(1, self.parse_count)
+    
+    def test_bare_token_in_cookie_header(self):
+        headers, body = self._call(touching_app, 'a=b; flag; c=d')
+        self.assertEqual(b'a:b,c:d', body)
+    
+    def test_no_cookie_header(self):
+        headers, body = self._call(touching_app)
+        self.assertEqual(b'', body)
+        self.assertEqual(0, self.parse_count)
+    
+    def test_untouched_cookies_are_not_parsed(self):
+        headers, body = self._call(ignoring_app, 'a=b')
+        self.assertEqual(b'none', body)
+        self.assertEqual(0, self.parse_count)
+        self.assertFalse('Set-Cookie' in [name for name, value in headers])
+    
+    def test_set_cookie_header(self):
+        headers, body = self._call(touching_app)
+        set_cookie = [value for name, value in headers if name == 'Set-Cookie']
+        self.assertEqual(1, len(set_cookie))
+        cookie = ocookie.CookieParser.parse_set_cookie_value(set_cookie[0])
+        self.assertEqual('visited', cookie.name)
+        self.assertEqual('yes', cookie.value)
+        self.assertEqual('/', cookie.path)
+        self.assertEqual(True, cookie.httponly)
+
+if __name__ == '__main__':
+    unittest.main()